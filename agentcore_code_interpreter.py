@@ -4,22 +4,30 @@ Provides code execution capabilities using AWS Bedrock AgentCore service
 """
 
 import os
+import sys
+import ast
+import time
+import asyncio
 import boto3
+from botocore.config import Config
 import logging
-import traceback
-from typing import Dict, Optional, Any
-from datetime import datetime
+import threading
+from contextlib import closing
+from functools import lru_cache
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Any, Tuple
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
-# Load environment variables to ensure AWS credentials are available
-load_dotenv()
+# Load environment variables to ensure AWS credentials are available, unless
+# the entrypoint (app.py) has already done so
+if os.environ.get("AGENTCORE_DOTENV_LOADED") != "1":
+    load_dotenv()
+    os.environ["AGENTCORE_DOTENV_LOADED"] = "1"
 
 # Global variables for session management
 agentcore_logger = None
 
-# Global AgentCore session tracking
-agentcore_sessions: Dict[str, Any] = {}
-
 # Configuration constants
 AGENTCORE_REGION = "us-west-2"
 AGENTCORE_ENDPOINT = "https://bedrock-agentcore.us-west-2.amazonaws.com"
@@ -27,25 +35,158 @@ CODE_INTERPRETER_IDENTIFIER = "aws.codeinterpreter.v1"
 SESSION_TIMEOUT_SECONDS = 900
 SESSION_NAME = "my-code-session"
 
+# Warm pool of pre-started sessions so execute_agentcore_code does not pay
+# for start_code_interpreter_session on the critical path. Opt-in: warm
+# sessions are billed while they sit idle.
+WARM_POOL_SIZE = int(os.getenv("AGENTCORE_WARM_POOL_SIZE", "0"))
+WARM_SESSION_MAX_AGE_SECONDS = SESSION_TIMEOUT_SECONDS - 60
+WARM_POOL_CHECK_SECONDS = 30
+
+# Answer snippets that only print literals locally instead of in a sandbox.
+# Opt-in: those results come from this server, not AgentCore Code Interpreter.
+LOCAL_TRIVIAL_SNIPPETS = os.getenv("AGENTCORE_LOCAL_TRIVIAL_SNIPPETS", "0") == "1"
+
+# Separates the output of batched shell commands in execute_shell_command_demo
+SHELL_SECTION_MARKER = "---AGENTCORE-SECTION---"
+
+# Sample files written by execute_file_management_demo
+DEMO_FILES = (
+    {
+        "path": "data.csv",
+        "text": "Date,Sales,Region\n2024-01-01,1500,North\n2024-01-02,1800,South\n2024-01-03,1200,East"
+    },
+    {
+        "path": "stats.py",
+        "text": "import pandas as pd\n\ndf = pd.read_csv('data.csv')\nprint('Sales Summary:')\nprint(df.describe())"
+    }
+)
+
+# Upper bound on tracked sessions; the oldest is stopped once it is exceeded.
+# Callers register a session only after they have finished using it.
+MAX_TRACKED_SESSIONS = 128
+
+
+class _SessionRegistry(OrderedDict):
+    """Session ID -> interpreter mapping that stops the oldest sessions when full
+
+    Evicted sessions are stopped in the background; until that finishes they
+    stay listed in pending_stops (stop future -> session ID).
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self.pending_stops: Dict[asyncio.Future, str] = {}
+
+    def __setitem__(self, session_id, interpreter):
+        super().__setitem__(session_id, interpreter)
+        self.move_to_end(session_id)
+        while len(self) > self.maxsize:
+            old_session_id, old_interpreter = self.popitem(last=False)
+            try:
+                stop = asyncio.get_running_loop().run_in_executor(
+                    None, old_interpreter.stop_session, old_session_id
+                )
+            except RuntimeError:
+                old_interpreter.stop_session(old_session_id)
+            else:
+                self.pending_stops[stop] = old_session_id
+                stop.add_done_callback(self._stop_done)
+
+    def _stop_done(self, stop: asyncio.Future):
+        session_id = self.pending_stops.pop(stop, None)
+        if not stop.cancelled() and stop.exception() is not None and agentcore_logger:
+            agentcore_logger.warning(f"Error stopping evicted session {session_id}: {stop.exception()}")
+
+
+# Global AgentCore session tracking
+agentcore_sessions: Dict[str, Any] = _SessionRegistry(MAX_TRACKED_SESSIONS)
+
+# Idle pre-started sessions as (session_id, interpreter, started_at) tuples
+_warm_sessions: Deque[Tuple[str, Any, float]] = deque()
+_warm_pool_lock = asyncio.Lock()
+_warm_pool_task: Optional[asyncio.Task] = None
+_warm_pool_maintainer: Optional[asyncio.Task] = None
+
+# Keep connections alive between the sequential invoke_code_interpreter calls
+# of a demo, and leave room in the pool for concurrent requests
+CLIENT_CONFIG = Config(
+    signature_version="v4",
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    connect_timeout=3,
+    read_timeout=60,
+    retries={"max_attempts": 5, "mode": "adaptive"}
+)
+
+
+@lru_cache(maxsize=None)
+def _get_session() -> boto3.Session:
+    """Get the process-wide boto3 session (credentials are resolved once)"""
+    return boto3.Session()
+
+
+# (region, endpoint_url) -> shared client. boto3 Sessions are not safe for
+# concurrent client creation, and a first request can race the import-time
+# prewarm thread, so clients are only built under _CLIENT_LOCK.
+_CLIENT_CACHE: Dict[Tuple[str, str], Any] = {}
+_CLIENT_LOCK = threading.Lock()
+
+
+def _make_client(region: str, endpoint_url: str):
+    """Get the shared Bedrock AgentCore client for a region/endpoint pair"""
+    key = (region, endpoint_url)
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        with _CLIENT_LOCK:
+            client = _CLIENT_CACHE.get(key)
+            if client is None:
+                client = _CLIENT_CACHE[key] = _get_session().client(
+                    "bedrock-agentcore",
+                    region_name=region,
+                    endpoint_url=endpoint_url,
+                    config=CLIENT_CONFIG
+                )
+    return client
+
+
+# Build the default client in the background at import so the first request
+# does not pay for loading the service model
+threading.Thread(
+    target=_make_client, args=(AGENTCORE_REGION, AGENTCORE_ENDPOINT), daemon=True
+).start()
+
 
 class AgentCoreCodeInterpreter:
-    """AWS Bedrock AgentCore Code Interpreter client wrapper"""
+    """AWS Bedrock AgentCore Code Interpreter client wrapper
+
+    The boto3 client is blocking, so async callers run these methods in a
+    worker thread (asyncio.to_thread) to keep the event loop responsive.
+    """
     
     def __init__(self, region: str = AGENTCORE_REGION, endpoint_url: str = AGENTCORE_ENDPOINT):
         self.region = region
         self.endpoint_url = endpoint_url
         self.client = None
+        # Start time (ISO 8601, UTC) of each session started by this interpreter
+        self.session_created_at: Dict[str, str] = {}
         
     def _get_client(self):
-        """Get or create boto3 client for Bedrock AgentCore"""
+        """Get the shared boto3 client for Bedrock AgentCore"""
         if self.client is None:
-            self.client = boto3.client(
-                "bedrock-agentcore", 
-                region_name=self.region, 
-                endpoint_url=self.endpoint_url
-            )
+            self.client = _make_client(self.region, self.endpoint_url)
         return self.client
     
+    @staticmethod
+    def _first_result(stream) -> Dict[str, Any]:
+        """Return the first 'result' event of a stream (or {}), then close it
+
+        Closing returns the connection to the pool even though the rest of
+        the stream is not read.
+        """
+        with closing(stream):
+            return next((event['result'] for event in stream if 'result' in event), {})
+
     def start_session(self, session_name: str = SESSION_NAME) -> str:
         """Start a new code interpreter session"""
         client = self._get_client()
@@ -57,6 +198,7 @@ class AgentCoreCodeInterpreter:
         )
         
         session_id = session_response["sessionId"]
+        self.session_created_at[session_id] = datetime.now(timezone.utc).isoformat()
         
         if agentcore_logger:
             agentcore_logger.info(f"Started AgentCore session: {session_id}")
@@ -78,16 +220,18 @@ class AgentCoreCodeInterpreter:
         )
 
         # Extract text output from the stream
-        output_text = ""
-        for event in execute_response['stream']:
-            if 'result' in event:
-                result = event['result']
-                if 'content' in result:
-                    for content_item in result['content']:
-                        if content_item['type'] == 'text':
-                            output_text += content_item['text'] + "\n"
-
-        return output_text.strip()
+        parts = []
+        with closing(execute_response['stream']) as stream:
+            for event in stream:
+                if 'result' in event:
+                    result = event['result']
+                    if 'content' in result:
+                        for content_item in result['content']:
+                            if content_item['type'] == 'text':
+                                parts.append(content_item['text'])
+                                parts.append("\n")
+
+        return "".join(parts).strip()
 
     def write_files(self, session_id: str, files: list) -> Dict[str, Any]:
         """
@@ -95,7 +239,7 @@ class AgentCoreCodeInterpreter:
 
         Args:
             session_id: The session ID
-            files: List of file dictionaries with 'path' and 'text' keys
+            files: List (or tuple) of file dictionaries with 'path' and 'text' keys
 
         Returns:
             Dictionary with success status and result
@@ -111,14 +255,7 @@ class AgentCoreCodeInterpreter:
             }
         )
 
-        # Extract result from the stream
-        result_data = {}
-        for event in write_response['stream']:
-            if 'result' in event:
-                result_data = event['result']
-                break
-
-        return result_data
+        return self._first_result(write_response['stream'])
 
     def list_files(self, session_id: str, path: str = "") -> Dict[str, Any]:
         """
@@ -142,14 +279,7 @@ class AgentCoreCodeInterpreter:
             }
         )
 
-        # Extract result from the stream
-        result_data = {}
-        for event in list_response['stream']:
-            if 'result' in event:
-                result_data = event['result']
-                break
-
-        return result_data
+        return self._first_result(list_response['stream'])
 
     def delete_files(self, session_id: str, paths: list) -> Dict[str, Any]:
         """
@@ -173,14 +303,7 @@ class AgentCoreCodeInterpreter:
             }
         )
 
-        # Extract result from the stream
-        result_data = {}
-        for event in delete_response['stream']:
-            if 'result' in event:
-                result_data = event['result']
-                break
-
-        return result_data
+        return self._first_result(delete_response['stream'])
 
     def execute_command(self, session_id: str, command: str) -> str:
         """
@@ -205,16 +328,18 @@ class AgentCoreCodeInterpreter:
         )
 
         # Extract text output from the stream
-        output_text = ""
-        for event in command_response['stream']:
-            if 'result' in event:
-                result = event['result']
-                if 'content' in result:
-                    for content_item in result['content']:
-                        if content_item['type'] == 'text':
-                            output_text += content_item['text'] + "\n"
-
-        return output_text.strip()
+        parts = []
+        with closing(command_response['stream']) as stream:
+            for event in stream:
+                if 'result' in event:
+                    result = event['result']
+                    if 'content' in result:
+                        for content_item in result['content']:
+                            if content_item['type'] == 'text':
+                                parts.append(content_item['text'])
+                                parts.append("\n")
+
+        return "".join(parts).strip()
 
     def stop_session(self, session_id: str) -> bool:
         """Stop a code interpreter session"""
@@ -235,6 +360,106 @@ class AgentCoreCodeInterpreter:
             return False
 
 
+def _retire_expired_warm_sessions():
+    """Stop warm sessions that are too close to their timeout to hand out"""
+    now = time.monotonic()
+    loop = asyncio.get_running_loop()
+    while _warm_sessions and now - _warm_sessions[0][2] >= WARM_SESSION_MAX_AGE_SECONDS:
+        session_id, interpreter, _ = _warm_sessions.popleft()
+        loop.run_in_executor(None, interpreter.stop_session, session_id)
+
+
+def _take_warm_session() -> Optional[Tuple[str, Any]]:
+    """Take an idle pre-started (session_id, interpreter) from the warm pool, if any"""
+    _retire_expired_warm_sessions()
+    if _warm_sessions:
+        session_id, interpreter, _ = _warm_sessions.popleft()
+        return session_id, interpreter
+    return None
+
+
+async def _refill_warm_pool():
+    """Top the warm pool back up to WARM_POOL_SIZE sessions"""
+    async with _warm_pool_lock:
+        try:
+            _retire_expired_warm_sessions()
+            while len(_warm_sessions) < WARM_POOL_SIZE:
+                interpreter = AgentCoreCodeInterpreter()
+                session_id = await asyncio.to_thread(interpreter.start_session)
+                _warm_sessions.append((session_id, interpreter, time.monotonic()))
+        except Exception as e:
+            if agentcore_logger:
+                agentcore_logger.warning(f"Error refilling AgentCore warm pool: {e}")
+
+
+def _schedule_warm_pool_refill():
+    """Refill the warm pool in the background unless a refill is running"""
+    global _warm_pool_task
+    if WARM_POOL_SIZE > 0 and (_warm_pool_task is None or _warm_pool_task.done()):
+        _warm_pool_task = asyncio.create_task(_refill_warm_pool())
+
+
+async def _maintain_warm_pool():
+    """Fill the warm pool, then periodically retire aged sessions and top it up"""
+    while True:
+        await _refill_warm_pool()
+        await asyncio.sleep(WARM_POOL_CHECK_SECONDS)
+
+
+def start_warm_pool():
+    """Start maintaining the warm pool from app startup (no-op when WARM_POOL_SIZE is 0)"""
+    global _warm_pool_maintainer
+    if WARM_POOL_SIZE > 0 and (_warm_pool_maintainer is None or _warm_pool_maintainer.done()):
+        _warm_pool_maintainer = asyncio.create_task(_maintain_warm_pool())
+
+
+async def stop_warm_pool():
+    """Stop the warm pool tasks and the idle sessions they started (app shutdown)"""
+    for task in (_warm_pool_maintainer, _warm_pool_task):
+        if task is not None and not task.done():
+            task.cancel()
+
+    async with _warm_pool_lock:
+        to_stop = [(session_id, interpreter) for session_id, interpreter, _ in _warm_sessions]
+        _warm_sessions.clear()
+
+    await asyncio.gather(*[
+        asyncio.to_thread(interpreter.stop_session, session_id)
+        for session_id, interpreter in to_stop
+    ], return_exceptions=True)
+
+
+def _evaluate_trivial_snippet(code: str) -> Optional[str]:
+    """
+    Evaluate a snippet locally if it only prints literals
+
+    Returns:
+        The snippet's output, or None if it needs the real interpreter
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    if not tree.body:
+        return None
+
+    lines = []
+    for node in tree.body:
+        call = node.value if isinstance(node, ast.Expr) else None
+        if not (
+            isinstance(call, ast.Call)
+            and isinstance(call.func, ast.Name)
+            and call.func.id == "print"
+            and not call.keywords
+            and all(isinstance(arg, ast.Constant) for arg in call.args)
+        ):
+            return None
+        lines.append(" ".join(str(arg.value) for arg in call.args))
+
+    return "\n".join(lines).strip()
+
+
 async def execute_agentcore_code(code: str) -> Dict[str, Any]:
     """
     Execute code using AWS Bedrock AgentCore and return the result
@@ -246,17 +471,32 @@ async def execute_agentcore_code(code: str) -> Dict[str, Any]:
         Dictionary with success status, output, session_id, and error (if any)
     """
     try:
-        # Create AgentCore client
-        interpreter = AgentCoreCodeInterpreter()
-        
-        # Start a new session
-        session_id = interpreter.start_session()
-        
-        # Execute the code
-        output_text = interpreter.execute_code(session_id, code)
+        # Snippets that only print literals don't need a sandbox at all
+        trivial_output = _evaluate_trivial_snippet(code) if LOCAL_TRIVIAL_SNIPPETS else None
+        if trivial_output is not None:
+            return {
+                "success": True,
+                "output": trivial_output,
+                "session_id": None,
+                "evaluated_locally": True
+            }
+
+        # Use a pre-started session if one is available, otherwise start one
+        warm_session = _take_warm_session()
+        if warm_session:
+            session_id, interpreter = warm_session
+        else:
+            interpreter = AgentCoreCodeInterpreter()
+            session_id = await asyncio.to_thread(interpreter.start_session)
+        _schedule_warm_pool_refill()
         
-        # Store session and client for later cleanup
-        agentcore_sessions[session_id] = interpreter
+        # Execute the code, then track the session for later cleanup.
+        # Sessions are registered only once they are idle: a full registry
+        # stops its oldest entry, which must not be a session still in use.
+        try:
+            output_text = await asyncio.to_thread(interpreter.execute_code, session_id, code)
+        finally:
+            agentcore_sessions[session_id] = interpreter
         
         return {
             "success": True,
@@ -285,93 +525,86 @@ async def execute_file_management_demo() -> Dict[str, Any]:
         interpreter = AgentCoreCodeInterpreter()
 
         # Start a new session
-        session_id = interpreter.start_session()
-
-        # Store session for later cleanup
-        agentcore_sessions[session_id] = interpreter
-
-        output_lines = []
-
-        # Step 1: Write sample files
-        output_lines.append("📝 Step 1: Writing files to sandbox...")
-        output_lines.append("")
-
-        files_to_create = [
-            {
-                "path": "data.csv",
-                "text": "Date,Sales,Region\n2024-01-01,1500,North\n2024-01-02,1800,South\n2024-01-03,1200,East"
-            },
-            {
-                "path": "stats.py",
-                "text": "import pandas as pd\n\ndf = pd.read_csv('data.csv')\nprint('Sales Summary:')\nprint(df.describe())"
-            }
-        ]
-
-        write_result = interpreter.write_files(session_id, files_to_create)
-        output_lines.append(f"✅ Files written successfully!")
-        output_lines.append(f"   - data.csv (3 rows of sales data)")
-        output_lines.append(f"   - stats.py (Python analysis script)")
-        output_lines.append("")
+        session_id = await asyncio.to_thread(interpreter.start_session)
 
-        # Step 2: List files
-        output_lines.append("📂 Step 2: Listing files in sandbox...")
-        output_lines.append("")
-
-        list_result = interpreter.list_files(session_id, "")
+        try:
+            output_lines = []
+
+            # Step 1: Write sample files
+            output_lines.append("📝 Step 1: Writing files to sandbox...")
+            output_lines.append("")
+
+            write_result = await asyncio.to_thread(interpreter.write_files, session_id, DEMO_FILES)
+            output_lines.append(f"✅ Files written successfully!")
+            output_lines.append(f"   - data.csv (3 rows of sales data)")
+            output_lines.append(f"   - stats.py (Python analysis script)")
+            output_lines.append("")
+
+            # Steps 2 and 3 only depend on the files being written, so run the
+            # listing and the script concurrently
+            list_result, code_output = await asyncio.gather(
+                asyncio.to_thread(interpreter.list_files, session_id, ""),
+                asyncio.to_thread(interpreter.execute_code, session_id, DEMO_FILES[1]['text'])
+            )
 
-        if 'content' in list_result:
-            for content_item in list_result['content']:
-                if content_item['type'] == 'text':
-                    output_lines.append(content_item['text'])
+            # Step 2: List files
+            output_lines.append("📂 Step 2: Listing files in sandbox...")
+            output_lines.append("")
 
-        output_lines.append("")
+            if 'content' in list_result:
+                for content_item in list_result['content']:
+                    if content_item['type'] == 'text':
+                        output_lines.append(content_item['text'])
 
-        # Step 3: Execute the Python script to verify files work
-        output_lines.append("▶️  Step 3: Executing stats.py to verify files...")
-        output_lines.append("")
+            output_lines.append("")
 
-        code_output = interpreter.execute_code(session_id, files_to_create[1]['text'])
-        output_lines.append(code_output)
-        output_lines.append("")
+            # Step 3: Execute the Python script to verify files work
+            output_lines.append("▶️  Step 3: Executing stats.py to verify files...")
+            output_lines.append("")
+            output_lines.append(code_output)
+            output_lines.append("")
 
-        # Step 4: Delete one file
-        output_lines.append("🗑️  Step 4: Deleting stats.py...")
-        output_lines.append("")
+            # Step 4: Delete one file
+            output_lines.append("🗑️  Step 4: Deleting stats.py...")
+            output_lines.append("")
 
-        delete_result = interpreter.delete_files(session_id, ["stats.py"])
-        output_lines.append("✅ File deleted successfully!")
-        output_lines.append("")
+            delete_result = await asyncio.to_thread(interpreter.delete_files, session_id, ["stats.py"])
+            output_lines.append("✅ File deleted successfully!")
+            output_lines.append("")
 
-        # Step 5: List files again to confirm deletion
-        output_lines.append("📂 Step 5: Listing files after deletion...")
-        output_lines.append("")
+            # Step 5: List files again to confirm deletion
+            output_lines.append("📂 Step 5: Listing files after deletion...")
+            output_lines.append("")
 
-        list_result_after = interpreter.list_files(session_id, "")
+            list_result_after = await asyncio.to_thread(interpreter.list_files, session_id, "")
 
-        if 'content' in list_result_after:
-            for content_item in list_result_after['content']:
-                if content_item['type'] == 'text':
-                    output_lines.append(content_item['text'])
+            if 'content' in list_result_after:
+                for content_item in list_result_after['content']:
+                    if content_item['type'] == 'text':
+                        output_lines.append(content_item['text'])
 
-        output_lines.append("")
-        output_lines.append("✅ File Management Demo Complete!")
+            output_lines.append("")
+            output_lines.append("✅ File Management Demo Complete!")
 
-        return {
-            "success": True,
-            "output": "\n".join(output_lines),
-            "session_id": session_id
-        }
+            return {
+                "success": True,
+                "output": "\n".join(output_lines),
+                "session_id": session_id
+            }
+        finally:
+            # Track the session for cleanup only once the demo is done with it
+            agentcore_sessions[session_id] = interpreter
     except Exception as e:
-        error_msg = f"{str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+        # Let the logging framework format the traceback only when it is emitted
         if agentcore_logger:
-            agentcore_logger.error(f"Error in file management demo: {error_msg}")
+            agentcore_logger.error("Error in file management demo", exc_info=True)
 
         # Also print to stderr for systemd logging
-        print(f"ERROR in file management demo: {error_msg}", file=__import__('sys').stderr)
+        print(f"ERROR in file management demo: {e}", file=sys.stderr)
 
         return {
             "success": False,
-            "error": error_msg
+            "error": str(e)
         }
 
 
@@ -387,94 +620,99 @@ async def execute_shell_command_demo() -> Dict[str, Any]:
         interpreter = AgentCoreCodeInterpreter()
 
         # Start a new session
-        session_id = interpreter.start_session()
-
-        # Store session for later cleanup
-        agentcore_sessions[session_id] = interpreter
-
-        output_lines = []
-
-        # Step 1: System Information
-        output_lines.append("🖥️  Step 1: Collecting system information...")
-        output_lines.append("")
-
-        command_output = interpreter.execute_command(session_id, "uname -a")
-        output_lines.append("System: " + command_output)
-        output_lines.append("")
+        session_id = await asyncio.to_thread(interpreter.start_session)
 
-        # Step 2: CPU Information
-        output_lines.append("⚙️  Step 2: Checking CPU information...")
-        output_lines.append("")
-
-        command_output = interpreter.execute_command(
-            session_id,
-            "cat /proc/cpuinfo | grep 'model name' | head -1 | cut -d':' -f2 | xargs"
-        )
-        output_lines.append("CPU Model: " + command_output)
-
-        command_output = interpreter.execute_command(
-            session_id,
-            "nproc"
-        )
-        output_lines.append("CPU Cores: " + command_output)
-        output_lines.append("")
-
-        # Step 3: Memory Information
-        output_lines.append("💾 Step 3: Checking memory information...")
-        output_lines.append("")
-
-        command_output = interpreter.execute_command(session_id, "free -h")
-        output_lines.append(command_output)
-        output_lines.append("")
-
-        # Step 4: Disk Usage
-        output_lines.append("💿 Step 4: Checking disk usage...")
-        output_lines.append("")
-
-        command_output = interpreter.execute_command(session_id, "df -h")
-        output_lines.append(command_output)
-        output_lines.append("")
-
-        # Step 5: Network Interfaces
-        output_lines.append("🌐 Step 5: Checking network interfaces...")
-        output_lines.append("")
-
-        command_output = interpreter.execute_command(session_id, "ip addr show | head -20")
-        output_lines.append(command_output)
-        output_lines.append("")
-
-        # Step 6: Environment Summary
-        output_lines.append("📊 Step 6: Environment summary...")
-        output_lines.append("")
-
-        command_output = interpreter.execute_command(session_id, "uptime")
-        output_lines.append("Uptime: " + command_output)
-
-        command_output = interpreter.execute_command(session_id, "whoami")
-        output_lines.append("Current User: " + command_output)
-
-        command_output = interpreter.execute_command(session_id, "pwd")
-        output_lines.append("Working Directory: " + command_output)
-        output_lines.append("")
-
-        output_lines.append("✅ System Information Collection Complete!")
+        try:
+            # Run every command in a single executeCommand round-trip, separated
+            # by a marker line, then split the output back into sections. Each
+            # command's stderr is folded into its stdout so error text lands in
+            # that command's own section.
+            commands = [
+                "uname -a",
+                "cat /proc/cpuinfo | grep 'model name' | head -1 | cut -d':' -f2 | xargs",
+                "nproc",
+                "free -h",
+                "df -h",
+                "ip addr show | head -20",
+                "uptime",
+                "whoami",
+                "pwd"
+            ]
+            batched_command = f"; echo '{SHELL_SECTION_MARKER}'; ".join(
+                f"{{ {command}; }} 2>&1" for command in commands
+            )
 
-        return {
-            "success": True,
-            "output": "\n".join(output_lines),
-            "session_id": session_id
-        }
+            command_output = await asyncio.to_thread(interpreter.execute_command, session_id, batched_command)
+            sections = [section.strip() for section in command_output.split(SHELL_SECTION_MARKER)]
+            sections += [""] * (len(commands) - len(sections))
+
+            (
+                system_info, cpu_model, cpu_cores, memory_info, disk_usage,
+                network_info, uptime, current_user, working_dir
+            ) = sections[:len(commands)]
+
+            output_lines = []
+
+            # Step 1: System Information
+            output_lines.append("🖥️  Step 1: Collecting system information...")
+            output_lines.append("")
+            output_lines.append("System: " + system_info)
+            output_lines.append("")
+
+            # Step 2: CPU Information
+            output_lines.append("⚙️  Step 2: Checking CPU information...")
+            output_lines.append("")
+            output_lines.append("CPU Model: " + cpu_model)
+            output_lines.append("CPU Cores: " + cpu_cores)
+            output_lines.append("")
+
+            # Step 3: Memory Information
+            output_lines.append("💾 Step 3: Checking memory information...")
+            output_lines.append("")
+            output_lines.append(memory_info)
+            output_lines.append("")
+
+            # Step 4: Disk Usage
+            output_lines.append("💿 Step 4: Checking disk usage...")
+            output_lines.append("")
+            output_lines.append(disk_usage)
+            output_lines.append("")
+
+            # Step 5: Network Interfaces
+            output_lines.append("🌐 Step 5: Checking network interfaces...")
+            output_lines.append("")
+            output_lines.append(network_info)
+            output_lines.append("")
+
+            # Step 6: Environment Summary
+            output_lines.append("📊 Step 6: Environment summary...")
+            output_lines.append("")
+            output_lines.append("Uptime: " + uptime)
+            output_lines.append("Current User: " + current_user)
+            output_lines.append("Working Directory: " + working_dir)
+            output_lines.append("")
+
+            output_lines.append("✅ System Information Collection Complete!")
+
+            return {
+                "success": True,
+                "output": "\n".join(output_lines),
+                "session_id": session_id
+            }
+        finally:
+            # Track the session for cleanup only once the demo is done with it
+            agentcore_sessions[session_id] = interpreter
     except Exception as e:
-        error_msg = f"{str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+        # Let the logging framework format the traceback only when it is emitted
         if agentcore_logger:
-            agentcore_logger.error(f"Error in shell command demo: {error_msg}")
+            agentcore_logger.error("Error in shell command demo", exc_info=True)
 
         # Also print to stderr for systemd logging
-        print(f"ERROR in shell command demo: {error_msg}", file=__import__('sys').stderr)
+        print(f"ERROR in shell command demo: {e}", file=sys.stderr)
 
         return {
             "success": False,
-            "error": error_msg
+            "error": str(e)
         }
 
 
@@ -486,19 +724,27 @@ async def reset_agentcore_sessions() -> Dict[str, Any]:
         Dictionary with success status, message, and error (if any)
     """
     try:
-        # Stop all active sessions
-        stopped_sessions = []
+        # Take a snapshot of all active and idle warm sessions and clear them
+        to_stop = list(agentcore_sessions.items())
+        agentcore_sessions.clear()
 
-        for session_id, interpreter in agentcore_sessions.items():
-            if interpreter.stop_session(session_id):
-                stopped_sessions.append(session_id)
+        async with _warm_pool_lock:
+            to_stop.extend((session_id, interpreter) for session_id, interpreter, _ in _warm_sessions)
+            _warm_sessions.clear()
 
-        # Clear the sessions dictionary
-        agentcore_sessions.clear()
+        # Evicted sessions whose background stop is still running
+        pending_stops = list(agentcore_sessions.pending_stops)
+
+        # Stop them concurrently, and wait for the evictions in flight
+        results = await asyncio.gather(*[
+            asyncio.to_thread(interpreter.stop_session, session_id)
+            for session_id, interpreter in to_stop
+        ], *pending_stops, return_exceptions=True)
+        stopped_count = sum(stopped is True for stopped in results)
 
         return {
             "success": True,
-            "message": f"Reset completed. Stopped {len(stopped_sessions)} sessions."
+            "message": f"Reset completed. Stopped {stopped_count} sessions."
         }
     except Exception as e:
         if agentcore_logger:
@@ -522,12 +768,14 @@ def get_active_sessions() -> Dict[str, Any]:
         session_info[session_id] = {
             "session_id": session_id,
             "region": interpreter.region,
-            "created_at": datetime.now().isoformat()  # This would be better tracked in a session object
+            "created_at": interpreter.session_created_at.get(session_id)
         }
     
     return {
         "total_sessions": len(agentcore_sessions),
-        "sessions": session_info
+        "sessions": session_info,
+        # Evicted sessions that are still being stopped
+        "stopping_sessions": list(agentcore_sessions.pending_stops.values())
     }
 
 
@@ -6,27 +6,910 @@ Provides API functions for demonstrating STM and LTM capabilities
 
 import os
 import time
+import asyncio
+import hashlib
+import string
+import logging
+import threading
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import uuid
-from datetime import datetime
+from collections import OrderedDict
+from contextlib import aclosing
+from functools import lru_cache
 from bedrock_agentcore.memory import MemoryClient
 from bedrock_agentcore.memory.session import MemorySessionManager
 from bedrock_agentcore.memory.constants import ConversationalMessage, MessageRole, RetrievalConfig
-from typing import Dict, Any, Optional, List, Generator
+from typing import Dict, Any, Optional, List, Generator, AsyncGenerator
 import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed, wait
+
+try:
+    import numpy as np
+except ImportError:  # the semantic cache is disabled without numpy
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _dumps(obj: Any) -> str:
+        # orjson emits UTF-8 without escaping, like ensure_ascii=False
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+
+# Shared clients keyed by (kind, *identity), reused across requests so warm
+# calls skip credential resolution and service-model loading
+_CLIENT_CACHE: Dict[tuple, Any] = {}
+_CLIENT_LOCK = threading.Lock()
+
+# One boto3 session for all Bedrock clients (credentials and service models
+# are resolved once), with a connection pool sized for concurrent demos
+_SESSION = boto3.session.Session()
+
+_BEDROCK_RUNTIME_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    connect_timeout=3,
+    read_timeout=60,
+    tcp_keepalive=True
+)
+
+
+def _get_cached_client(key: tuple, factory):
+    """Return the cached client for key, creating it with factory() on first use"""
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        # boto3 sessions are not safe for concurrent client creation (the
+        # import-time pre-warm can race the first request)
+        with _CLIENT_LOCK:
+            client = _CLIENT_CACHE.get(key)
+            if client is None:
+                client = _CLIENT_CACHE[key] = factory()
+    return client
+
+
+def _get_bedrock_runtime(region_name: str):
+    """Shared Bedrock Runtime client for a region"""
+    return _get_cached_client(
+        ('bedrock-runtime', region_name),
+        lambda: _SESSION.client('bedrock-runtime', region_name=region_name, config=_BEDROCK_RUNTIME_CONFIG)
+    )
+
+
+def _get_memory_client(region_name: str) -> MemoryClient:
+    """Shared MemoryClient for a region"""
+    return _get_cached_client(
+        ('memory-client', region_name),
+        lambda: MemoryClient(region_name=region_name, boto3_session=_SESSION)
+    )
+
+
+def _get_session_manager(memory_id: str, region_name: str) -> MemorySessionManager:
+    """Shared MemorySessionManager for a memory resource"""
+    return _get_cached_client(
+        ('memory-session-manager', memory_id, region_name),
+        lambda: MemorySessionManager(
+            memory_id=memory_id,
+            region_name=region_name,
+            boto_client_config=_MEMORY_CLIENT_CONFIG
+        )
+    )
+
+
+# Worker threads for independent AgentCore Memory calls (boto3 clients are
+# thread-safe, so STM and LTM requests can be in flight at the same time).
+# Keep it at or below the client connection pool size.
+IO_POOL_SIZE = int(os.getenv("AGENTCORE_IO_POOL", "16"))
+
+# Separate threads for the create streams' create_memory_and_wait, which holds
+# a worker for up to minutes; on the IO pool a few concurrent creates would
+# starve the short list/store calls
+CREATE_WAIT_POOL_SIZE = int(os.getenv("AGENTCORE_CREATE_WAIT_POOL", "4"))
+
+# Session-manager clients get one connection per IO worker, so fan-outs do not
+# hit "Connection pool is full" (botocore defaults to 10)
+_MEMORY_CLIENT_CONFIG = Config(
+    max_pool_connections=max(IO_POOL_SIZE, 10),
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    connect_timeout=5,
+    read_timeout=30,
+    tcp_keepalive=True
+)
+
+# Also open the control-plane HTTPS connection during pre-warm with one
+# cheap ListMemories call, so the first user request skips the TLS handshake.
+# Opt-in because it makes an AWS request at import time.
+PREWARM_CONNECTIONS = os.getenv("AGENTCORE_PREWARM_CONNECTIONS", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+# Error codes that mean "slow down", as opposed to a request that will never succeed
+_THROTTLING_CODES = frozenset({
+    'ThrottlingException', 'TooManyRequestsException', 'ThrottledException',
+    'RequestLimitExceeded', 'ServiceUnavailableException'
+})
+
+
+def _aws_error_fields(e: Exception) -> Dict[str, Any]:
+    """Failure-response fields that tell callers whether retrying an AWS error can help
+
+    botocore has already retried with adaptive backoff by the time an error
+    reaches us; surfacing retryable/retry_after lets callers back off further
+    on throttling and not retry validation or permission errors at all.
+    """
+    if not isinstance(e, ClientError):
+        return {}
+    code = e.response.get('Error', {}).get('Code', '')
+    metadata = e.response.get('ResponseMetadata', {})
+    retryable = code in _THROTTLING_CODES or metadata.get('HTTPStatusCode', 0) >= 500
+    fields = {"error_code": code, "retryable": retryable}
+    if retryable:
+        retry_after = metadata.get('HTTPHeaders', {}).get('retry-after')
+        fields["retry_after"] = int(retry_after) if retry_after and retry_after.isdigit() else 1
+    return fields
+
+
+# 设置 AGENTCORE_PROFILE=1 时，创建类接口在返回结果中附带各 AWS 调用耗时 (timings, 毫秒)
+PROFILE_AWS_CALLS = os.getenv("AGENTCORE_PROFILE", "0") == "1"
+
+
+class _PerfSpan:
+    """Times a block into timings[label] (ms); a no-op when timings is None
+
+    Time spent in a nested paused() block, such as a generator waiting on its
+    consumer after a yield, is left out.
+    """
+
+    __slots__ = ("timings", "label", "start", "excluded")
+
+    def __init__(self, timings: Optional[Dict[str, float]], label: str):
+        self.timings = timings
+        self.label = label
+
+    def __enter__(self):
+        if self.timings is not None:
+            self.excluded = 0
+            self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            elapsed = time.perf_counter_ns() - self.start - self.excluded
+            self.timings[self.label] = round(elapsed / 1e6, 2)
+        return False
+
+    def paused(self) -> "_PerfPause":
+        return _PerfPause(self)
+
+
+class _PerfPause:
+    """Leaves the time of a block out of the enclosing _PerfSpan"""
+
+    __slots__ = ("span", "start")
+
+    def __init__(self, span: _PerfSpan):
+        self.span = span
+
+    def __enter__(self):
+        if self.span.timings is not None:
+            self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.span.timings is not None:
+            self.span.excluded += time.perf_counter_ns() - self.start
+        return False
+
+
+def _log_store_failure(future):
+    """Done-callback for background stores, whose errors have no caller to reach"""
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if exc is not None:
+        logger.error(f"Background add_turns failed: {exc}", exc_info=exc)
+
+
+_USER_ROLE = MessageRole.USER.value
+
+
+def _content_text(item: Dict[str, Any], default: str = '', _empty: Dict[str, Any] = {}) -> str:
+    """Text of a message or memory record whose content may be a dict or a plain value"""
+    # _empty is shared (never mutated) so misses do not allocate a dict per call;
+    # boto3 parses responses into plain dicts, so an exact type check is enough
+    content = item.get('content', _empty)
+    if type(content) is dict:
+        return content.get('text', default)
+    return str(content)
+
+
+def _record_info(record: Dict[str, Any], include_full: bool = False) -> Dict[str, Any]:
+    """Display fields of an LTM memory record (full text only when asked for)"""
+    text = _content_text(record, 'N/A')
+    info = {
+        "record_id": record.get('memoryRecordId', 'N/A'),
+        "namespace": record.get('namespace', 'N/A'),
+        "created_at": record.get('createdAt', 'N/A'),
+        "content": text[:200],  # 只显示前200字符
+        "content_truncated": len(text) > 200
+    }
+    if include_full:
+        info["content_full"] = text  # 完整内容
+    return info
+
+
+def _stm_event_info(event: Dict[str, Any], include_full: bool = False) -> Dict[str, Any]:
+    """Display fields of an STM event and its conversational messages"""
+    payload = event.get('payload', [])
+    messages = []
+    for item in payload:
+        conv = item.get('conversational')
+        if conv is not None:
+            text = _content_text(conv, 'N/A')
+            message = {
+                "role": conv.get('role', 'N/A'),
+                "text": text[:100],  # 只显示前100字符
+                "text_truncated": len(text) > 100
+            }
+            if include_full:
+                message["text_full"] = text
+            messages.append(message)
+
+    return {
+        "event_id": event.get('eventId', 'N/A'),
+        "session_id": event.get('sessionId', 'N/A'),
+        "timestamp": event.get('eventTimestamp', 'N/A'),
+        "payload_count": len(payload),
+        "messages": messages
+    }
+
+
+def _iter_turn_messages(turns):
+    """Yield (display role, text) for every message of get_last_k_turns() output"""
+    for turn in turns:
+        for msg in turn:
+            role = "用户" if msg.get('role') == _USER_ROLE else "助手"
+            yield role, _content_text(msg)
+
+
+_LTM_CONTEXT_HEADER = "长期记忆 (跨会话):\n"
+_STM_CONTEXT_HEADER = "会话历史 (当前会话):\n"
+
+
+def _combined_context(ltm_texts: List[str], stm_pairs: List[tuple]) -> str:
+    """LLM context for the combined demos: LTM memories, then the session history"""
+    if not (ltm_texts or stm_pairs):
+        return ""
+    context_parts = []
+    if ltm_texts:
+        context_parts.append(_LTM_CONTEXT_HEADER + "\n".join(f"- {text}" for text in ltm_texts))
+    if stm_pairs:
+        context_parts.append(_STM_CONTEXT_HEADER + "\n".join(f"{role}: {text}" for role, text in stm_pairs))
+    return "\n\n".join(context_parts)
+
+
+def _digest(text: str) -> str:
+    """Cheap stable digest for in-process cache keys (not a security boundary)"""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+# Default memory resources (app.py loads .env before importing this module)
+STM_MEMORY_ID = os.getenv('STM_MEMORY_ID')
+LTM_MEMORY_ID = os.getenv('LTM_MEMORY_ID')
+
+
+# LLM settings shared by call_llm / call_llm_stream
+LLM_MODEL_ID = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+LLM_TEMPERATURE = 0.7
+
+# Replies for bare greetings sent without memory context, answered locally
+# instead of paying a Bedrock round trip (opt-in: the canned text replaces the
+# live reply and is stored in STM as the assistant turn). Replies are in
+# Chinese, as the system prompt asks of the model.
+CANNED_GREETINGS_ENABLED = os.getenv("LLM_CANNED_GREETINGS", "false").lower() == "true"
+_CANNED_REPLIES: Dict[str, str] = {
+    **dict.fromkeys(
+        ("你好", "您好", "你好！", "您好！", "你好呀", "你好啊", "嗨", "哈喽", "早上好", "下午好", "晚上好",
+         "hi", "hello", "hey", "hi!", "hello!", "hey!", "good morning", "good afternoon", "good evening"),
+        "你好！我是你的 AI 助手，有什么可以帮您？"
+    ),
+    **dict.fromkeys(("谢谢", "thanks"), "不客气！还有什么可以帮您的吗？"),
+}
+
+
+def _canned_reply(user_input: str, context: str) -> Optional[str]:
+    """Canned reply for a context-free greeting, or None"""
+    if not CANNED_GREETINGS_ENABLED or context:
+        return None
+    return _CANNED_REPLIES.get(user_input.strip().lower())
+
+
+# Streamed tokens are coalesced into one log event per ~64 chars or 30ms,
+# since Bedrock deltas are often only a few characters long
+TOKEN_FLUSH_CHARS = 64
+TOKEN_FLUSH_SECONDS = 0.03
+
+# Retrieved memories echoed in the LTM step-2 log; the result payload and the
+# LLM context keep every search hit
+LTM_LOG_DISPLAY_K = 3
+
+# Upper bound for settling an overlapped store before the result event
+STORE_TIMEOUT_SECONDS = 30
+
+# SSE comment sent while a long blocking call runs, so proxies and the
+# browser see traffic instead of an idle connection
+HEARTBEAT_SECONDS = 5
+_HEARTBEAT_FRAME = b": heartbeat\n\n"
+
+# Optional delay after each log frame, for presenting the demo step by step.
+# Off by default: SSE already renders frames as they arrive.
+STREAM_PACE_SECONDS = float(os.getenv("AGENTCORE_STREAM_PACE", "0"))
+
+# Detail lines in the "logs" field of the non-streaming create calls; set
+# AGENTCORE_VERBOSE_LOGS=0 to return only the outcome lines
+VERBOSE_LOGS = os.getenv("AGENTCORE_VERBOSE_LOGS", "1") != "0"
+
+# Exact-match LLM response cache, persisted across restarts (opt-in: the
+# model samples at LLM_TEMPERATURE, so a cached reply replaces a fresh one)
+EXACT_CACHE_ENABLED = os.getenv("LLM_EXACT_CACHE", "false").lower() == "true"
+EXACT_CACHE_MAX_ENTRIES = int(os.getenv("LLM_EXACT_CACHE_SIZE", "1000"))
+EXACT_CACHE_DB = os.path.join(".cache", "llm_exact.db")
+
+# Semantic LLM response cache (opt-in: cached answers are reused for
+# paraphrased questions asked with the same memory context)
+SEMANTIC_CACHE_ENABLED = os.getenv("LLM_SEMANTIC_CACHE", "false").lower() == "true"
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+EMBEDDING_DIMENSIONS = 256
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("LLM_SEMANTIC_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_DB = os.path.join(".cache", "llm_sem.db")
+
+
+def _open_cache_db(db_path: str, schema: str, label: str):
+    """Open (creating if needed) a cache's SQLite file, or None if that fails"""
+    try:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute(schema)
+        db.commit()
+        return db
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"{label} persistence disabled: {e}")
+        return None
+
+
+class ExactCache:
+    """
+    LLM response cache keyed by a digest of (model, system prompt, user input)
+
+    Least recently used entries are evicted beyond max_entries. Entries are
+    persisted to SQLite one row at a time, so a store costs the same however
+    large the cache is. Hits only update the in-memory recency; their
+    last-used times are written with the next store, or by flush().
+    """
+
+    def __init__(self, max_entries: int = EXACT_CACHE_MAX_ENTRIES, db_path: Optional[str] = EXACT_CACHE_DB):
+        self.max_entries = max_entries
+        # key -> response, least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        # key -> last hit time not yet written to SQLite
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._db = _open_cache_db(
+            db_path,
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, used REAL)",
+            "Exact cache"
+        ) if db_path else None
+        self._load()
+
+    def _load(self):
+        """Restore the most recently used entries from SQLite"""
+        if not self._db:
+            return
+        rows = self._db.execute(
+            "SELECT key, response FROM responses ORDER BY used DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, response in reversed(rows):
+            self._entries[key] = response
+        with self._db:
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def _write(self, statements: List[tuple]):
+        """Apply (sql, params) statements in one transaction (caller holds the lock)"""
+        if not self._db:
+            return
+        try:
+            with self._db:
+                for sql, params in statements:
+                    self._db.execute(sql, params)
+        except sqlite3.Error as e:
+            logger.warning(f"Exact cache write failed: {e}")  # the in-memory entry is kept
+
+    def _touched_statements(self) -> List[tuple]:
+        """UPDATEs for the pending hit times, which are then cleared (caller holds the lock)"""
+        statements = [
+            ("UPDATE responses SET used = ? WHERE key = ?", (used, key))
+            for key, used in self._touched.items()
+        ]
+        self._touched.clear()
+        return statements
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self._touched[key] = time.time()
+            return response
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            self._touched.pop(key, None)
+            statements = self._touched_statements()
+            statements.append((
+                "INSERT OR REPLACE INTO responses (key, response, used) VALUES (?, ?, ?)",
+                (key, response, time.time())
+            ))
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                statements.append(("DELETE FROM responses WHERE key = ?", (evicted,)))
+            self._write(statements)
+
+    def flush(self):
+        """Write the last-used times of hits since the previous store"""
+        with self._lock:
+            if self._touched:
+                self._write(self._touched_statements())
+
+
+class SemanticCache:
+    """
+    LLM response cache keyed by embedding similarity
+
+    An entry only matches when the memory context is identical; among those,
+    the most similar cached input wins if its cosine similarity reaches the
+    threshold. Least recently used entries are evicted beyond max_entries and
+    entries expire after ttl_seconds. Entries are persisted to SQLite so they
+    survive restarts.
+    """
+
+    def __init__(self, embed, threshold: float = 0.92, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = 3600, db_path: Optional[str] = SEMANTIC_CACHE_DB):
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # entry id -> (context digest, normalized embedding, response, stored at)
+        self._entries: OrderedDict = OrderedDict()
+        # Ids for entries that could not be persisted; negative, so they never
+        # collide with the row ids SQLite assigns
+        self._next_local_id = -1
+        self._lock = threading.Lock()
+        self._db = _open_cache_db(
+            db_path,
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, embedding BLOB, response TEXT, "
+            "created REAL, hits INTEGER DEFAULT 0, ctx_hash TEXT)",
+            "Semantic cache"
+        ) if db_path else None
+        self._load()
+
+    def _load(self):
+        """Restore unexpired entries from SQLite, oldest first"""
+        if not self._db:
+            return
+        self._write("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,))
+        rows = self._db.execute(
+            "SELECT id, ctx_hash, embedding, response, created FROM entries ORDER BY created DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for key, context_hash, blob, response, created in reversed(rows):
+            self._entries[key] = (context_hash, np.frombuffer(blob, dtype=np.float32), response, created)
+
+    def _write(self, sql: str, params) -> Optional[int]:
+        """
+        Run one statement in its own transaction (caller holds the lock)
+
+        params is a tuple, or a list of tuples to run the statement once per
+        tuple. Returns the inserted row id, or None if nothing was persisted.
+        """
+        if not self._db:
+            return None
+        try:
+            with self._db:
+                if isinstance(params, list):
+                    self._db.executemany(sql, params)
+                    return None
+                return self._db.execute(sql, params).lastrowid
+        except sqlite3.Error as e:
+            logger.warning(f"Semantic cache write failed: {e}")  # the in-memory entry is kept
+            return None
+
+    def _evict(self, keys: List[int]):
+        """Drop entries from memory and SQLite (caller holds the lock)"""
+        if not keys:
+            return
+        for key in keys:
+            del self._entries[key]
+        self._write("DELETE FROM entries WHERE id = ?", [(key,) for key in keys])
+
+    def _best_match(self, query, context_hash: str) -> Optional[int]:
+        """Id of the most similar entry for this context at or above the threshold"""
+        keys = [key for key, entry in self._entries.items() if entry[0] == context_hash]
+        if not keys:
+            return None
+        # One matrix-vector product scores every candidate at once
+        scores = np.stack([self._entries[key][1] for key in keys]) @ query
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def lookup(self, user_input: str, context: str = ""):
+        """Return (cached response or None, query embedding or None)"""
+        try:
+            query = self._embed(user_input)
+        except Exception:
+            return None, None
+
+        context_hash = _digest(context)
+        now = time.time()
+        with self._lock:
+            self._evict([key for key, entry in self._entries.items() if now - entry[3] > self.ttl_seconds])
+
+            key = self._best_match(query, context_hash)
+            if key is not None:
+                self._entries.move_to_end(key)
+                self._write("UPDATE entries SET hits = hits + 1 WHERE id = ?", (key,))
+                return self._entries[key][2], query
+
+        return None, query
+
+    def store(self, query, context: str, response: str):
+        """Cache response under the query embedding returned by lookup()"""
+        if query is None or not response:
+            return
+
+        context_hash = _digest(context)
+        created = time.time()
+        with self._lock:
+            # SQLite assigns the id, so instances sharing the file never clash
+            key = self._write(
+                "INSERT INTO entries (embedding, response, created, ctx_hash) VALUES (?, ?, ?, ?)",
+                (query.astype(np.float32).tobytes(), response, created, context_hash)
+            )
+            if key is None:
+                key = self._next_local_id
+                self._next_local_id -= 1
+            self._entries[key] = (context_hash, query, response, created)
+
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._evict(list(self._entries)[:overflow])
+
+
+# Extraction strategies of the LTM demo resource (MemoryClient deep-copies
+# them before adding namespace defaults, so one list serves every call)
+_LTM_STRATEGIES = [
+    {
+        "semanticMemoryStrategy": {
+            "name": "semantic_facts",
+            "description": "提取用户提到的重要事实和信息",
+            "namespaces": ["/strategies/{memoryStrategyId}/actors/{actorId}"]
+        }
+    },
+    {
+        "userPreferenceMemoryStrategy": {
+            "name": "user_preferences",
+            "description": "提取用户的偏好、喜好和习惯",
+            "namespaces": ["/strategies/{memoryStrategyId}/actors/{actorId}"]
+        }
+    }
+]
+
+# Repeat list_memories / list_ltm_records calls within this window (UI
+# refreshes) reuse the previous result; create/delete clears it
+LIST_CACHE_TTL_SECONDS = float(os.getenv("AGENTCORE_LIST_CACHE_TTL", "5"))
+LIST_CACHE_MAX_ENTRIES = 256
+
+# Comment above each strategy in the displayed sample code
+_STRATEGY_CODE_COMMENTS = {
+    "semanticMemoryStrategy": "语义记忆策略: 提取重要的事实和信息",
+    "userPreferenceMemoryStrategy": "用户偏好策略: 提取用户的喜好和偏好",
+}
+
+
+def _strategies_code(strategies: List[Dict[str, Any]], indent: str = "        ") -> str:
+    """Python source of a strategies list for the sample code, derived from the real config"""
+    blocks = []
+    for strategy in strategies:
+        (kind, config), = strategy.items()
+        fields = ",\n".join(
+            f'{indent}        "{key}": {json.dumps(value, ensure_ascii=False)}' for key, value in config.items()
+        )
+        blocks.append(
+            f"{indent}# {_STRATEGY_CODE_COMMENTS[kind]}\n"
+            f"{indent}{{\n{indent}    \"{kind}\": {{\n{fields}\n{indent}    }}\n{indent}}}"
+        )
+    return ",\n".join(blocks)
+
+
+# Status polling of the async LTM create, which waits without holding a thread.
+# The interval starts short and doubles up to the cap, so a quick transition is
+# seen promptly and a minutes-long one costs few GetMemory calls.
+MEMORY_POLL_INITIAL_SECONDS = 0.2
+MEMORY_POLL_MAX_SECONDS = 5
+MEMORY_WAIT_SECONDS = 300
+
+
+def _strategy_summaries(memory: Dict[str, Any]) -> List[Dict[str, str]]:
+    """name/type/id of each strategy on a memory, for new or old response field names"""
+    return [
+        {
+            "name": strategy.get('name', 'N/A'),
+            "type": strategy.get('type', 'N/A'),
+            "strategy_id": strategy.get('strategyId', strategy.get('memoryStrategyId', 'N/A'))
+        }
+        for strategy in memory.get('strategies') or memory.get('memoryStrategies') or []
+    ]
+
+
+# Static description of the LTM extraction strategies, shared by both create paths
+_LTM_STRATEGY_LOG_LINES = (
+    "⚙️ 配置策略 1: Semantic Memory Strategy",
+    "   - 自动提取重要事实和信息",
+    "   - 使用 LLM 进行语义分析",
+    "",
+    "⚙️ 配置策略 2: User Preference Memory Strategy",
+    "   - 自动提取用户偏好",
+    "   - 支持跨会话记忆",
+)
+
+# Sample code shown while a memory is created; only the region and name vary
+_STM_CODE_TMPL = string.Template('''import time
+from datetime import datetime
+from bedrock_agentcore.memory import MemoryClient
+
+print("🚀 开始创建 Short-Term Memory (STM)")
+print(f"⏱️  开始时间: {datetime.now().strftime('%H:%M:%S')}")
+print()
+
+start_time = time.time()
+
+# 初始化 Memory Client
+print("📡 初始化 MemoryClient...")
+client = MemoryClient(region_name="$region")
+elapsed = time.time() - start_time
+print(f"✅ MemoryClient 初始化成功 (region: $region) [{elapsed:.2f}s]")
+
+# 生成 Memory 名称
+print(f"📝 生成 Memory 名称: $name")
+print()
+
+# 创建 STM (不配置策略)
+print("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
+print(f"   - 名称: $name")
+print("   - 策略: 无 (STM 不需要提取策略)")
+print("   - 事件保留期: 7 天")
+print()
+
+elapsed = time.time() - start_time
+print(f"⏳ 正在创建，请稍候... [{elapsed:.2f}s]")
+
+api_start = time.time()
+stm = client.create_memory_and_wait(
+    name="$name",
+    strategies=[],  # 空列表 = 不配置提取策略
+    description="Short-term memory demo - 仅存储原始对话",
+    event_expiry_days=7  # 保存7天
+)
+api_elapsed = time.time() - api_start
+
+print()
+print("✅ STM 创建成功!")
+print(f"   - Memory ID: {stm['id']}")
+print(f"   - 状态: {stm.get('status', 'ACTIVE')}")
+print(f"   - 创建时间: {stm.get('createdAt', 'N/A')}")
+print(f"   - API 耗时: {api_elapsed:.2f}秒")
+
+total_elapsed = time.time() - start_time
+print()
+print(f"⏱️  总耗时: {total_elapsed:.2f}秒")
+print()
+print("💡 提示: STM 适用于会话内的短期记忆，即时存储，无需等待")''')
+
+_LTM_CODE_TMPL = string.Template('''import time
+from datetime import datetime
+from bedrock_agentcore.memory import MemoryClient
+
+print("🚀 开始创建 Long-Term Memory (LTM)")
+print(f"⏱️  开始时间: {datetime.now().strftime('%H:%M:%S')}")
+print()
+
+start_time = time.time()
+
+# 初始化 Memory Client
+print("📡 初始化 MemoryClient...")
+client = MemoryClient(region_name="$region")
+elapsed = time.time() - start_time
+print(f"✅ MemoryClient 初始化成功 (region: $region) [{elapsed:.2f}s]")
+
+# 生成 Memory 名称
+print(f"📝 生成 Memory 名称: $name")
+print()
+
+# 创建 LTM (配置语义和偏好策略)
+print("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
+print(f"   - 名称: $name")
+print("   - 策略: 2 个 (语义记忆 + 用户偏好)")
+print("   - 事件保留期: 30 天")
+print()
+print("⚙️ 配置策略 1: Semantic Memory Strategy")
+print("   - 自动提取重要事实和信息")
+print("   - 使用 LLM 进行语义分析")
+print()
+print("⚙️ 配置策略 2: User Preference Memory Strategy")
+print("   - 自动提取用户偏好")
+print("   - 支持跨会话记忆")
+print()
+
+elapsed = time.time() - start_time
+print(f"⏳ 正在创建并配置策略，请稍候... [{elapsed:.2f}s]")
+
+api_start = time.time()
+ltm = client.create_memory_and_wait(
+    name="$name",
+    strategies=[
+$strategies
+    ],
+    description="Long-term memory demo - 智能提取和跨会话记忆",
+    event_expiry_days=30  # 保存30天
+)
+api_elapsed = time.time() - api_start
+
+print()
+print("✅ LTM 创建成功!")
+print(f"   - Memory ID: {ltm['id']}")
+print(f"   - 状态: {ltm.get('status', 'ACTIVE')}")
+print(f"   - 创建时间: {ltm.get('createdAt', 'N/A')}")
+print(f"   - 策略: (查看详细信息)")
+print(f"   - API 耗时: {api_elapsed:.2f}秒")
+
+total_elapsed = time.time() - start_time
+print()
+print(f"⏱️  总耗时: {total_elapsed:.2f}秒")
+print()
+print("💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")''')
+
+
+# Shorter variants returned by the non-streaming create endpoints
+_STM_SUMMARY_CODE_TMPL = string.Template('''from bedrock_agentcore.memory import MemoryClient
+
+# 初始化 Memory Client
+client = MemoryClient(region_name="$region")
+
+# 创建 STM (不配置策略)
+stm = client.create_memory_and_wait(
+    name="$name",
+    strategies=[],  # 空列表 = 不配置提取策略
+    description="Short-term memory demo - 仅存储原始对话",
+    event_expiry_days=7  # 保存7天
+)
+
+print(f"STM 创建成功: {stm['id']}")''')
+
+_LTM_SUMMARY_CODE_TMPL = string.Template('''from bedrock_agentcore.memory import MemoryClient
+
+# 初始化 Memory Client
+client = MemoryClient(region_name="$region")
+
+# 创建 LTM (配置语义和偏好策略)
+ltm = client.create_memory_and_wait(
+    name="$name",
+    strategies=[
+$strategies
+    ],
+    description="Long-term memory demo - 智能提取和跨会话记忆",
+    event_expiry_days=30  # 保存30天
+)
+
+print(f"LTM 创建成功: {ltm['id']}")''')
+
+# The sample code shows exactly the strategies the demo creates
+_LTM_STRATEGIES_CODE = _strategies_code(_LTM_STRATEGIES)
+
+_MEMORY_CODE_TEMPLATES = {
+    ("stm", True): _STM_CODE_TMPL,
+    ("ltm", True): _LTM_CODE_TMPL,
+    ("stm", False): _STM_SUMMARY_CODE_TMPL,
+    ("ltm", False): _LTM_SUMMARY_CODE_TMPL,
+}
+
+
+@lru_cache(maxsize=128)
+def _build_memory_code_snippet(kind: str, name: str, region: str, streaming: bool = True) -> str:
+    """Sample create-memory code for kind 'stm' or 'ltm', as shown by the stream or plain endpoint"""
+    return _MEMORY_CODE_TEMPLATES[kind, streaming].substitute(
+        region=region, name=name, strategies=_LTM_STRATEGIES_CODE
+    )
 
 
 class AgentCoreMemoryAPI:
     """Memory API handler"""
 
+    # Exact response cache shared by all instances, opened on first use
+    _exact_cache: Optional[ExactCache] = None
+    _exact_cache_lock = threading.Lock()
+
     def __init__(self, region_name: str = "us-west-2"):
         self.region_name = region_name
         self.memory_client = None
         self.bedrock_runtime = None
         self.stm_manager = None
         self.ltm_manager = None
-        self.stm_memory_id = os.getenv('STM_MEMORY_ID')
-        self.ltm_memory_id = os.getenv('LTM_MEMORY_ID')
+        self.stm_memory_id = STM_MEMORY_ID
+        self.ltm_memory_id = LTM_MEMORY_ID
+        self.semantic_cache = SemanticCache(self._embed_text) if SEMANTIC_CACHE_ENABLED and np is not None else None
+        self._io_pool = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="agentcore-io")
+        self._submit = self._io_pool.submit
+        self._create_wait_pool = ThreadPoolExecutor(
+            max_workers=CREATE_WAIT_POOL_SIZE, thread_name_prefix="agentcore-create-wait"
+        )
+        # (expires_at, result) of recent list calls, keyed by call and arguments
+        self._list_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._list_cache_lock = threading.Lock()
+
+    def _ensure_memory_client(self) -> MemoryClient:
+        """The shared MemoryClient, attached on first use when initialize() has not run"""
+        if not self.memory_client:
+            self.memory_client = _get_memory_client(self.region_name)
+        return self.memory_client
+
+    @staticmethod
+    def _copy_list_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a list result and its item lists, so callers cannot change the cached one"""
+        return {field: list(value) if type(value) is list else value for field, value in result.items()}
+
+    def _cached_list(self, key: tuple, use_cache: bool, fetch) -> Dict[str, Any]:
+        """Return a recent successful fetch() result for key, or call it and remember the result"""
+        if use_cache:
+            with self._list_cache_lock:
+                entry = self._list_cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return self._copy_list_result(entry[1])
+
+        result = fetch()
+        if result.get("success"):
+            with self._list_cache_lock:
+                self._list_cache[key] = (time.monotonic() + LIST_CACHE_TTL_SECONDS, self._copy_list_result(result))
+                self._list_cache.move_to_end(key)
+                while len(self._list_cache) > LIST_CACHE_MAX_ENTRIES:
+                    self._list_cache.popitem(last=False)
+        return result
+
+    def _invalidate_list_cache(self):
+        """Drop cached list results after a memory resource is created or deleted"""
+        with self._list_cache_lock:
+            self._list_cache.clear()
+
+    def close(self):
+        """Finish queued Memory calls and stop the worker threads"""
+        self._io_pool.shutdown(wait=True)
+        if self._exact_cache is not None:
+            self._exact_cache.flush()
+        # Creates already in flight complete server-side; do not hold shutdown for them
+        self._create_wait_pool.shutdown(wait=False, cancel_futures=True)
 
     def initialize(self, stm_memory_id: str = None, ltm_memory_id: str = None) -> Dict[str, Any]:
         """Initialize Memory Managers"""
@@ -43,18 +926,12 @@ class AgentCoreMemoryAPI:
                     "message": "请先设置 STM_MEMORY_ID 和 LTM_MEMORY_ID 环境变量"
                 }
 
-            self.memory_client = MemoryClient(region_name=self.region_name)
-            self.bedrock_runtime = boto3.client('bedrock-runtime', region_name=self.region_name)
+            self.memory_client = _get_memory_client(self.region_name)
+            self.bedrock_runtime = _get_bedrock_runtime(self.region_name)
 
-            self.stm_manager = MemorySessionManager(
-                memory_id=self.stm_memory_id,
-                region_name=self.region_name
-            )
+            self.stm_manager = _get_session_manager(self.stm_memory_id, self.region_name)
 
-            self.ltm_manager = MemorySessionManager(
-                memory_id=self.ltm_memory_id,
-                region_name=self.region_name
-            )
+            self.ltm_manager = _get_session_manager(self.ltm_memory_id, self.region_name)
 
             return {
                 "success": True,
@@ -68,16 +945,15 @@ class AgentCoreMemoryAPI:
                 "message": f"初始化失败: {str(e)}"
             }
 
-    def initialize_stream(self, stm_memory_id: str = None, ltm_memory_id: str = None) -> Generator[str, None, None]:
+    def initialize_stream(self, stm_memory_id: str = None, ltm_memory_id: str = None) -> Generator[bytes, None, None]:
         """Initialize Memory Managers (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
+        start_time = time.monotonic()
+        logs = []
 
         try:
-            yield self._send_event("log", "🚀 开始初始化 Memory Managers")
-            yield self._send_event("log", f"⏱️  开始时间: {datetime.now().strftime('%H:%M:%S')}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append("🚀 开始初始化 Memory Managers")
+            logs.append(f"⏱️  开始时间: {time.strftime('%H:%M:%S')}")
+            logs.append("")
 
             # Use provided IDs or fallback to environment variables
             if stm_memory_id:
@@ -86,60 +962,51 @@ class AgentCoreMemoryAPI:
                 self.ltm_memory_id = ltm_memory_id
 
             if not self.stm_memory_id or not self.ltm_memory_id:
-                yield self._send_event("log", "❌ 请先设置 STM_MEMORY_ID 和 LTM_MEMORY_ID")
+                logs.append("❌ 请先设置 STM_MEMORY_ID 和 LTM_MEMORY_ID")
+                yield from self._flush_logs(logs)
                 yield self._send_event("result", {
                     "success": False,
                     "message": "请先设置 STM_MEMORY_ID 和 LTM_MEMORY_ID"
                 })
                 return
 
-            yield self._send_event("log", f"📝 STM Memory ID: {self.stm_memory_id}")
-            yield self._send_event("log", f"📝 LTM Memory ID: {self.ltm_memory_id}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(f"📝 STM Memory ID: {self.stm_memory_id}")
+            logs.append(f"📝 LTM Memory ID: {self.ltm_memory_id}")
+            logs.append("")
 
             # Initialize MemoryClient
-            yield self._send_event("log", "🔧 初始化 MemoryClient...")
-            time_module.sleep(0.1)
-            self.memory_client = MemoryClient(region_name=self.region_name)
-            yield self._send_event("log", f"✅ MemoryClient 初始化成功 (region: {self.region_name})")
-            time_module.sleep(0.1)
+            logs.append("🔧 初始化 MemoryClient...")
+            yield from self._flush_logs(logs)
+            self.memory_client = _get_memory_client(self.region_name)
+            logs.append(f"✅ MemoryClient 初始化成功 (region: {self.region_name})")
 
             # Initialize Bedrock Runtime
-            yield self._send_event("log", "🔧 初始化 Bedrock Runtime...")
-            time_module.sleep(0.1)
-            self.bedrock_runtime = boto3.client('bedrock-runtime', region_name=self.region_name)
-            yield self._send_event("log", "✅ Bedrock Runtime 初始化成功")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append("🔧 初始化 Bedrock Runtime...")
+            yield from self._flush_logs(logs)
+            self.bedrock_runtime = _get_bedrock_runtime(self.region_name)
+            logs.append("✅ Bedrock Runtime 初始化成功")
+            logs.append("")
 
             # Initialize STM Manager
-            yield self._send_event("log", "🔄 初始化 STM Manager...")
-            time_module.sleep(0.1)
-            self.stm_manager = MemorySessionManager(
-                memory_id=self.stm_memory_id,
-                region_name=self.region_name
-            )
-            yield self._send_event("log", f"✅ STM Manager 初始化成功")
-            yield self._send_event("log", f"   - Memory ID: {self.stm_memory_id}")
-            time_module.sleep(0.1)
+            logs.append("🔄 初始化 STM Manager...")
+            yield from self._flush_logs(logs)
+            self.stm_manager = _get_session_manager(self.stm_memory_id, self.region_name)
+            logs.append(f"✅ STM Manager 初始化成功")
+            logs.append(f"   - Memory ID: {self.stm_memory_id}")
 
             # Initialize LTM Manager
-            yield self._send_event("log", "🔄 初始化 LTM Manager...")
-            time_module.sleep(0.1)
-            self.ltm_manager = MemorySessionManager(
-                memory_id=self.ltm_memory_id,
-                region_name=self.region_name
-            )
-            yield self._send_event("log", f"✅ LTM Manager 初始化成功")
-            yield self._send_event("log", f"   - Memory ID: {self.ltm_memory_id}")
-            time_module.sleep(0.1)
+            logs.append("🔄 初始化 LTM Manager...")
+            yield from self._flush_logs(logs)
+            self.ltm_manager = _get_session_manager(self.ltm_memory_id, self.region_name)
+            logs.append(f"✅ LTM Manager 初始化成功")
+            logs.append(f"   - Memory ID: {self.ltm_memory_id}")
 
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            yield self._send_event("log", "✨ Memory Managers 初始化完成，可以开始演示了！")
+            total_elapsed = time.monotonic() - start_time
+            logs.append("")
+            logs.append(f"⏱️  总耗时: {total_elapsed:.2f}秒")
+            logs.append("")
+            logs.append("✨ Memory Managers 初始化完成，可以开始演示了！")
+            yield from self._flush_logs(logs)
 
             yield self._send_event("result", {
                 "success": True,
@@ -150,68 +1017,123 @@ class AgentCoreMemoryAPI:
             })
 
         except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"❌ 初始化失败: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
+            elapsed = time.monotonic() - start_time
+            logs.append("")
+            logs.append(f"❌ 初始化失败: {str(e)}")
+            logs.append(f"⏱️  失败耗时: {elapsed:.2f}秒")
+            yield from self._flush_logs(logs)
             yield self._send_event("result", {
                 "success": False,
                 "message": f"初始化失败: {str(e)}",
                 "elapsed_time": f"{elapsed:.2f}s"
             })
 
-    def call_llm(self, user_input: str, context: str = "") -> str:
-        """调用 Bedrock Claude 模型"""
-        try:
-            system_prompt = "你是一个友好的 AI 助手，请用中文回答。"
-            if context:
-                system_prompt += f"\n\n相关记忆上下文:\n{context}"
-
-            response = self.bedrock_runtime.converse(
-                modelId="us.anthropic.claude-sonnet-4-5-20250929-v1:0",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [{"text": user_input}]
-                    }
-                ],
-                system=[{"text": system_prompt}],
-                inferenceConfig={
-                    "maxTokens": 2000,
-                    "temperature": 0.7,
-                }
-            )
-
-            return response['output']['message']['content'][0]['text']
-        except Exception as e:
-            return f"LLM 调用错误: {str(e)}"
-
-    def call_llm_stream(self, user_input: str, context: str = "") -> Generator[str, None, None]:
-        """调用 Bedrock Claude 模型 (流式响应) - 带重试机制"""
-        import time as time_module
+    def _embed_text(self, text: str):
+        """Embed text with Titan (normalized, so dot product = cosine similarity)"""
+        response = self.bedrock_runtime.invoke_model(
+            modelId=EMBEDDING_MODEL_ID,
+            body=json.dumps({"inputText": text, "dimensions": EMBEDDING_DIMENSIONS, "normalize": True})
+        )
+        embedding = json.loads(response['body'].read())['embedding']
+        return np.asarray(embedding, dtype=np.float32)
+
+    def _semantic_lookup(self, user_input: str, context: str):
+        """Look up the semantic cache; returns (cached response, query embedding)"""
+        if not self.semantic_cache:
+            return None, None
+        return self.semantic_cache.lookup(user_input, context)
+
+    @staticmethod
+    def _build_system_prompt(context: str) -> str:
+        """System prompt with the recalled memory context appended"""
+        system_prompt = "你是一个友好的 AI 助手，请用中文回答。"
+        if context:
+            system_prompt += f"\n\n相关记忆上下文:\n{context}"
+        return system_prompt
+
+    @staticmethod
+    def _exact_cache_key(system_prompt: str, user_input: str) -> str:
+        payload = json.dumps({'m': LLM_MODEL_ID, 's': system_prompt, 'u': user_input}, sort_keys=True)
+        return _digest(payload)
+
+    @classmethod
+    def _get_exact_cache(cls) -> ExactCache:
+        """The shared exact cache, loaded from disk on first use"""
+        if cls._exact_cache is None:
+            with cls._exact_cache_lock:
+                if cls._exact_cache is None:
+                    cls._exact_cache = ExactCache()
+        return cls._exact_cache
+
+    def _exact_lookup(self, key: str) -> Optional[str]:
+        return self._get_exact_cache().get(key)
+
+    def _exact_store(self, key: str, response: str):
+        """Cache response under key (persisted incrementally)"""
+        if response:
+            self._get_exact_cache().put(key, response)
+
+    def _lookup_caches(self, user_input: str, context: str, cache_exact: Optional[bool]):
+        """
+        Check the canned, exact and semantic caches in that order
+
+        Returns (cached response or None, exact cache key, query embedding); the
+        key and embedding are passed to _store_caches() after a model call.
+        """
+        canned = _canned_reply(user_input, context)
+        if canned is not None:
+            return canned, None, None
+
+        if cache_exact is None:
+            cache_exact = EXACT_CACHE_ENABLED
+        exact_key = None
+        if cache_exact:
+            exact_key = self._exact_cache_key(self._build_system_prompt(context), user_input)
+            cached = self._exact_lookup(exact_key)
+            if cached is not None:
+                return cached, exact_key, None
+
+        cached, query = self._semantic_lookup(user_input, context)
+        return cached, exact_key, query
+
+    def _store_caches(self, exact_key: Optional[str], query, context: str, text: str):
+        if exact_key:
+            self._exact_store(exact_key, text)
+        if self.semantic_cache:
+            self.semantic_cache.store(query, context, text)
+
+    def _converse_stream(self, user_input: str, context: str) -> Generator[tuple, None, None]:
+        """
+        Stream a Bedrock Claude reply, retrying throttling / unavailable errors
+
+        Yields ("text", delta) for model output and ("retry", notice) before each
+        retry; the final error is raised. Retries only happen before any text
+        has been produced, so the text deltas always form a single reply.
+        """
+        # Request payload is identical across retries, so build it once
+        messages = [
+            {
+                "role": "user",
+                "content": [{"text": user_input}]
+            }
+        ]
+        system = [{"text": self._build_system_prompt(context)}]
+        inference_config = {
+            "maxTokens": 2000,
+            "temperature": LLM_TEMPERATURE,
+        }
 
         max_retries = 3
         retry_delay = 2  # seconds
 
         for attempt in range(max_retries):
+            produced = False
             try:
-                system_prompt = "你是一个友好的 AI 助手，请用中文回答。"
-                if context:
-                    system_prompt += f"\n\n相关记忆上下文:\n{context}"
-
                 response = self.bedrock_runtime.converse_stream(
-                    modelId="us.anthropic.claude-sonnet-4-5-20250929-v1:0",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [{"text": user_input}]
-                        }
-                    ],
-                    system=[{"text": system_prompt}],
-                    inferenceConfig={
-                        "maxTokens": 2000,
-                        "temperature": 0.7,
-                    }
+                    modelId=LLM_MODEL_ID,
+                    messages=messages,
+                    system=system,
+                    inferenceConfig=inference_config
                 )
 
                 # Stream the response
@@ -219,7 +1141,8 @@ class AgentCoreMemoryAPI:
                     if 'contentBlockDelta' in event:
                         delta = event['contentBlockDelta']['delta']
                         if 'text' in delta:
-                            yield delta['text']
+                            produced = True
+                            yield "text", delta['text']
 
                 # If we got here, the call was successful
                 return
@@ -228,15 +1151,56 @@ class AgentCoreMemoryAPI:
                 error_msg = str(e)
 
                 # Check if it's a retryable error
-                if attempt < max_retries - 1 and ('serviceUnavailableException' in error_msg or 'ThrottlingException' in error_msg):
-                    yield f"\n⚠️  Bedrock 暂时不可用，{retry_delay}秒后重试 (尝试 {attempt + 1}/{max_retries})...\n"
-                    time_module.sleep(retry_delay)
+                retryable = 'serviceUnavailableException' in error_msg or 'ThrottlingException' in error_msg
+                if attempt < max_retries - 1 and retryable and not produced:
+                    yield "retry", f"\n⚠️  Bedrock 暂时不可用，{retry_delay}秒后重试 (尝试 {attempt + 1}/{max_retries})...\n"
+                    time.sleep(retry_delay)
                     retry_delay *= 2  # Exponential backoff
                     continue
-                else:
-                    # Final error or non-retryable error
-                    yield f"\n❌ LLM 调用失败: {error_msg}\n"
-                    return
+                raise
+
+    def call_llm(self, user_input: str, context: str = "", cache_exact: Optional[bool] = None) -> str:
+        """调用 Bedrock Claude 模型
+
+        cache_exact: reuse identical (model, system, user) responses; defaults to
+        on when LLM_EXACT_CACHE=true
+        """
+        cached, exact_key, query = self._lookup_caches(user_input, context, cache_exact)
+        if cached is not None:
+            return cached
+
+        try:
+            # converse_stream delivers the first bytes sooner than converse and
+            # shares the retry handling with call_llm_stream
+            text = "".join(delta for kind, delta in self._converse_stream(user_input, context) if kind == "text")
+        except Exception as e:
+            return f"LLM 调用错误: {str(e)}"
+
+        self._store_caches(exact_key, query, context, text)
+        return text
+
+    def call_llm_stream(self, user_input: str, context: str = "", cache_exact: Optional[bool] = None) -> Generator[str, None, None]:
+        """调用 Bedrock Claude 模型 (流式响应) - 带重试机制"""
+        cached, exact_key, query = self._lookup_caches(user_input, context, cache_exact)
+        if cached is not None:
+            # Keep the streaming contract for cache hits (and canned replies),
+            # replayed in 20-character chunks
+            for i in range(0, len(cached), 20):
+                yield cached[i:i + 20]
+            return
+
+        parts = []
+        try:
+            for kind, delta in self._converse_stream(user_input, context):
+                if kind == "text":
+                    parts.append(delta)
+                yield delta
+        except Exception as e:
+            # Final error or non-retryable error
+            yield f"\n❌ LLM 调用失败: {str(e)}\n"
+            return
+
+        self._store_caches(exact_key, query, context, "".join(parts))
 
     def demo_stm_step1(self, user_message: str, actor_id: str) -> Dict[str, Any]:
         """STM Demo - 步骤 1: 存储第一条消息"""
@@ -300,20 +1264,14 @@ class AgentCoreMemoryAPI:
             )
 
             # 构建上下文
-            context_lines = []
-            for turn in recent_turns:
-                for msg in turn:
-                    role = "用户" if msg.get('role') == MessageRole.USER.value else "助手"
-                    text = msg.get('content', {}).get('text', '')
-                    context_lines.append(f"{role}: {text}")
-
-            context = "\n".join(context_lines)
+            context = "\n".join(f"{role}: {text}" for role, text in _iter_turn_messages(recent_turns))
 
             # 调用 LLM
             assistant_response = self.call_llm(user_message, context)
 
-            # 存储新的对话
-            self.stm_manager.add_turns(
+            # 存储新的对话 (后台写入，不阻塞响应)
+            self._store_in_background(
+                self.stm_manager,
                 actor_id=actor_id,
                 session_id=session_id,
                 messages=[
@@ -404,11 +1362,7 @@ class AgentCoreMemoryAPI:
             memory_list = []
             if memories:
                 for i, memory in enumerate(memories, 1):
-                    content = memory.get('content', {})
-                    if isinstance(content, dict):
-                        text = content.get('text', '')
-                    else:
-                        text = str(content)
+                    text = _content_text(memory)
                     relevance = memory.get('relevanceScore', 0.0)
 
                     context_lines.append(f"{i}. {text}")
@@ -422,8 +1376,9 @@ class AgentCoreMemoryAPI:
             # 调用 LLM
             assistant_response = self.call_llm(user_question, context)
 
-            # 存储新的对话
-            self.ltm_manager.add_turns(
+            # 存储新的对话 (后台写入，不阻塞响应)
+            self._store_in_background(
+                self.ltm_manager,
                 actor_id=actor_id,
                 session_id=session_id,
                 messages=[
@@ -459,77 +1414,46 @@ class AgentCoreMemoryAPI:
 
             session_id = f"combined-{int(time.time())}"
 
-            # 1. 从 LTM 获取长期记忆
-            ltm_memories = self.ltm_manager.search_long_term_memories(
+            # 1. 从 LTM 获取长期记忆, 2. 从 STM 获取会话历史 (并行请求)
+            ltm_future = self._submit(
+                self.ltm_manager.search_long_term_memories,
                 query=user_question,
                 namespace_prefix="/",
                 top_k=3
             )
+            stm_future = self._submit(
+                self.stm_manager.get_last_k_turns,
+                actor_id=actor_id,
+                session_id=session_id,
+                k=3
+            )
 
-            # 2. 从 STM 获取会话历史 (如果有的话)
+            ltm_memories = ltm_future.result()
+
+            # STM 会话历史 (如果有的话)
             stm_turns = []
             try:
-                stm_turns = self.stm_manager.get_last_k_turns(
-                    actor_id=actor_id,
-                    session_id=session_id,
-                    k=3
-                )
-            except:
+                stm_turns = stm_future.result()
+            except Exception:
                 pass
 
             # 3. 构建综合上下文
-            context_parts = []
-            ltm_list = []
-            stm_list = []
-
-            if ltm_memories:
-                ltm_lines = []
-                for memory in ltm_memories:
-                    content = memory.get('content', {})
-                    if isinstance(content, dict):
-                        text = content.get('text', '')
-                    else:
-                        text = str(content)
-                    ltm_lines.append(f"- {text}")
-                    ltm_list.append(text)
-
-                if ltm_lines:
-                    context_parts.append("长期记忆 (跨会话):\n" + "\n".join(ltm_lines))
-
-            if stm_turns:
-                stm_lines = []
-                for turn in stm_turns:
-                    for msg in turn:
-                        role = "用户" if msg.get('role') == MessageRole.USER.value else "助手"
-                        text = msg.get('content', {}).get('text', '')
-                        stm_lines.append(f"{role}: {text}")
-                        stm_list.append({"role": role, "text": text})
-
-                if stm_lines:
-                    context_parts.append("会话历史 (当前会话):\n" + "\n".join(stm_lines))
-
-            context = "\n\n".join(context_parts)
+            ltm_list = [_content_text(memory) for memory in ltm_memories or []]
+            stm_pairs = list(_iter_turn_messages(stm_turns or []))
+            stm_list = [{"role": role, "text": text} for role, text in stm_pairs]
+            context = _combined_context(ltm_list, stm_pairs)
 
             # 4. 调用 LLM
             assistant_response = self.call_llm(user_question, context)
 
-            # 5. 同时存储到 STM 和 LTM
+            # 5. 同时存储到 STM 和 LTM (后台写入，不阻塞响应)
             messages = [
                 ConversationalMessage(user_question, MessageRole.USER),
                 ConversationalMessage(assistant_response, MessageRole.ASSISTANT)
             ]
 
-            self.stm_manager.add_turns(
-                actor_id=actor_id,
-                session_id=session_id,
-                messages=messages
-            )
-
-            self.ltm_manager.add_turns(
-                actor_id=actor_id,
-                session_id=session_id,
-                messages=messages
-            )
+            for manager in (self.stm_manager, self.ltm_manager):
+                self._store_in_background(manager, actor_id=actor_id, session_id=session_id, messages=messages)
 
             return {
                 "success": True,
@@ -547,58 +1471,117 @@ class AgentCoreMemoryAPI:
                 "message": f"错误: {str(e)}"
             }
 
-    def demo_stm_step1_stream(self, user_message: str, actor_id: str) -> Generator[str, None, None]:
-        """STM Demo - 步骤 1: 存储第一条消息 (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
+    def _stream_llm_reply(self, logs: List[str], user_input: str, context: str = "",
+                          label: str = "🤖 调用 LLM 生成回复...") -> Generator[bytes, None, str]:
+        """Stream LLM tokens as token events; returns the full assistant response"""
+        logs.append(label)
+        yield from self._flush_logs(logs)
+
+        api_start = time.monotonic()
+        parts = []
+        pending = []
+        pending_chars = 0
+        last_flush = time.monotonic()
+        for chunk in self.call_llm_stream(user_input, context):
+            parts.append(chunk)
+            pending.append(chunk)
+            pending_chars += len(chunk)
+            # Stream partial response to user
+            if pending_chars >= TOKEN_FLUSH_CHARS or time.monotonic() - last_flush > TOKEN_FLUSH_SECONDS:
+                yield self._send_event("token", "".join(pending))
+                pending.clear()
+                pending_chars = 0
+                last_flush = time.monotonic()
+        if pending:
+            yield self._send_event("token", "".join(pending))
+        api_elapsed = time.monotonic() - api_start
+
+        logs.append("")
+        logs.append(f"✅ LLM 回复完成")
+        logs.append(f"   ⏱️  LLM 耗时: {api_elapsed:.2f}秒")
+        logs.append("")
+        return "".join(parts)
+
+    def _run_turn_stream(self, title: str, checks: List[tuple], steps) -> Generator[bytes, None, None]:
+        """
+        Shared skeleton of the demo streams
+
+        checks are (failed, message) preconditions reported in order. steps(logs)
+        is a generator that emits the demo-specific events and returns
+        (result fields, closing hint, pending) where pending lists
+        (label, future) stores to settle right before the result event.
+        """
+        start_time = time.monotonic()
+        logs = []
 
         try:
-            yield self._send_event("log", "🚀 开始 STM Demo - 步骤 1: 存储第一条对话")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(title)
+            logs.append("")
 
-            if not self.stm_manager:
-                yield self._send_event("log", "❌ 请先初始化 Memory Manager")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先初始化 Memory Manager"
-                })
-                return
+            for failed, message in checks:
+                if failed:
+                    logs.append(f"❌ {message}")
+                    yield from self._flush_logs(logs)
+                    yield self._send_event("result", {
+                        "success": False,
+                        "message": message
+                    })
+                    return
+
+            result, hint, pending = yield from steps(logs)
+
+            total_elapsed = time.monotonic() - start_time
+            logs.append("")
+            logs.append(f"⏱️  总耗时: {total_elapsed:.2f}秒")
+            logs.append("")
+            logs.append(hint)
+            yield from self._flush_logs(logs)
+
+            # Stores overlapped with the closing logs; correct the optimistic
+            # confirmation if one of them failed
+            for label, future in pending:
+                try:
+                    future.result(timeout=STORE_TIMEOUT_SECONDS)
+                except Exception as e:
+                    logs.append(f"⚠️  {label}失败: {str(e) or type(e).__name__}")
+                    result = {**result, "store_error": str(e) or type(e).__name__}
+            yield from self._flush_logs(logs)
 
+            yield self._send_event("result", {
+                "success": True,
+                **result,
+                "elapsed_time": f"{total_elapsed:.2f}s"
+            })
+
+        except Exception as e:
+            elapsed = time.monotonic() - start_time
+            logs.append("")
+            logs.append(f"❌ 错误: {str(e)}")
+            logs.append(f"⏱️  失败耗时: {elapsed:.2f}秒")
+            yield from self._flush_logs(logs)
+            yield self._send_event("result", {
+                "success": False,
+                "elapsed_time": f"{elapsed:.2f}s",
+                "message": f"错误: {str(e)}"
+            })
+
+    def demo_stm_step1_stream(self, user_message: str, actor_id: str) -> Generator[bytes, None, None]:
+        """STM Demo - 步骤 1: 存储第一条消息 (流式输出)"""
+        def steps(logs):
             session_id = f"stm-{int(time.time())}"
 
-            # 不再发送代码片段，页面已经有静态代码示例了
-            # 直接开始执行步骤
-
-            yield self._send_event("log", f"📝 用户消息: {user_message}")
-            yield self._send_event("log", f"👤 Actor ID: {actor_id}")
-            yield self._send_event("log", f"🔗 Session ID: {session_id}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 调用 LLM (流式响应)
-            yield self._send_event("log", "🤖 调用 LLM 生成回复...")
-            time_module.sleep(0.1)
-
-            api_start = time_module.time()
-            assistant_response = ""
-            for chunk in self.call_llm_stream(user_message):
-                assistant_response += chunk
-                # Stream partial response to user
-                yield self._send_event("log", f"💬 {chunk}")
-            api_elapsed = time_module.time() - api_start
-
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"✅ LLM 回复完成")
-            yield self._send_event("log", f"   ⏱️  LLM 耗时: {api_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(f"📝 用户消息: {user_message}")
+            logs.append(f"👤 Actor ID: {actor_id}")
+            logs.append(f"🔗 Session ID: {session_id}")
+            logs.append("")
 
-            # 存储到 STM
-            yield self._send_event("log", "💾 存储对话到 STM...")
-            time_module.sleep(0.1)
+            assistant_response = yield from self._stream_llm_reply(logs, user_message)
 
-            self.stm_manager.add_turns(
+            # 存储到 STM (与后续日志并行，发送结果前确认)
+            logs.append("💾 存储对话到 STM...")
+
+            store_future = self._submit(
+                self.stm_manager.add_turns,
                 actor_id=actor_id,
                 session_id=session_id,
                 messages=[
@@ -607,127 +1590,64 @@ class AgentCoreMemoryAPI:
                 ]
             )
 
-            yield self._send_event("log", "✅ 已存储到 Short-term Memory")
-            yield self._send_event("log", f"📊 Session ID: {session_id}")
-            time_module.sleep(0.05)
+            logs.append("✅ 已存储到 Short-term Memory")
+            logs.append(f"📊 Session ID: {session_id}")
 
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            yield self._send_event("log", "✨ 提示: 请继续执行步骤 2，询问相关问题测试 STM 的记忆能力")
-
-            yield self._send_event("result", {
-                "success": True,
+            return {
                 "session_id": session_id,
                 "actor_id": actor_id,
                 "user_message": user_message,
                 "assistant_response": assistant_response,
-                "elapsed_time": f"{total_elapsed:.2f}s",
                 "message": "已存储到 Short-term Memory"
-            })
+            }, "✨ 提示: 请继续执行步骤 2，询问相关问题测试 STM 的记忆能力", [("STM 存储", store_future)]
 
-        except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"❌ 错误: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
-            yield self._send_event("result", {
-                "success": False,
-                "elapsed_time": f"{elapsed:.2f}s",
-                "message": f"错误: {str(e)}"
-            })
+        yield from self._run_turn_stream(
+            "🚀 开始 STM Demo - 步骤 1: 存储第一条对话",
+            [(not self.stm_manager, "请先初始化 Memory Manager")],
+            steps
+        )
 
-    def demo_stm_step2_stream(self, user_message: str, session_id: str, actor_id: str) -> Generator[str, None, None]:
+    def demo_stm_step2_stream(self, user_message: str, session_id: str, actor_id: str) -> Generator[bytes, None, None]:
         """STM Demo - 步骤 2: 基于历史对话回答 (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
+        def steps(logs):
+            logs.append(f"📝 用户问题: {user_message}")
+            logs.append(f"🔗 Session ID: {session_id}")
+            logs.append("")
 
-        try:
-            yield self._send_event("log", "🚀 开始 STM Demo - 步骤 2: 基于历史对话回答")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            # 获取历史对话
+            logs.append("🔍 从 STM 检索历史对话...")
+            yield from self._flush_logs(logs)
 
-            if not self.stm_manager:
-                yield self._send_event("log", "❌ 请先初始化 Memory Manager")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先初始化 Memory Manager"
-                })
-                return
-
-            if not session_id or not actor_id:
-                yield self._send_event("log", "❌ 请先执行步骤 1")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先执行步骤 1"
-                })
-                return
-
-            # 不再发送代码片段，页面已经有静态代码示例了
-            # 直接开始执行步骤
-
-            yield self._send_event("log", f"📝 用户问题: {user_message}")
-            yield self._send_event("log", f"🔗 Session ID: {session_id}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 获取历史对话
-            yield self._send_event("log", "🔍 从 STM 检索历史对话...")
-            time_module.sleep(0.1)
-
-            recent_turns = self.stm_manager.get_last_k_turns(
-                actor_id=actor_id,
-                session_id=session_id,
-                k=5
-            )
+            recent_turns = self.stm_manager.get_last_k_turns(
+                actor_id=actor_id,
+                session_id=session_id,
+                k=5
+            )
 
             # 构建上下文
-            context_lines = []
-            for turn in recent_turns:
-                for msg in turn:
-                    role = "用户" if msg.get('role') == MessageRole.USER.value else "助手"
-                    text = msg.get('content', {}).get('text', '')
-                    context_lines.append(f"{role}: {text}")
-
+            context_lines = [f"{role}: {text}" for role, text in _iter_turn_messages(recent_turns)]
             context = "\n".join(context_lines)
 
-            yield self._send_event("log", f"✅ 检索到 {len(recent_turns)} 轮历史对话")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(f"✅ 检索到 {len(recent_turns)} 轮历史对话")
+            logs.append("")
 
             # 显示历史上下文
-            yield self._send_event("log", "📜 历史对话上下文:")
+            logs.append("📜 历史对话上下文:")
             for line in context_lines[:6]:  # 只显示前6条
-                yield self._send_event("log", f"   {line[:80]}...")
-                time_module.sleep(0.05)
+                logs.append(f"   {line[:80]}...")
             if len(context_lines) > 6:
-                yield self._send_event("log", f"   ... (还有 {len(context_lines)-6} 条)")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 调用 LLM (流式响应)
-            yield self._send_event("log", "🤖 调用 LLM 生成回复 (基于历史上下文)...")
-            time_module.sleep(0.1)
-
-            api_start = time_module.time()
-            assistant_response = ""
-            for chunk in self.call_llm_stream(user_message, context):
-                assistant_response += chunk
-                yield self._send_event("log", f"💬 {chunk}")
-            api_elapsed = time_module.time() - api_start
-
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"✅ LLM 回复完成")
-            yield self._send_event("log", f"   ⏱️  LLM 耗时: {api_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 存储新的对话
-            yield self._send_event("log", "💾 存储新对话到 STM...")
-            time_module.sleep(0.1)
+                logs.append(f"   ... (还有 {len(context_lines)-6} 条)")
+            logs.append("")
 
-            self.stm_manager.add_turns(
+            assistant_response = yield from self._stream_llm_reply(
+                logs, user_message, context, "🤖 调用 LLM 生成回复 (基于历史上下文)..."
+            )
+
+            # 存储新的对话 (与后续日志并行，发送结果前确认)
+            logs.append("💾 存储新对话到 STM...")
+
+            store_future = self._submit(
+                self.stm_manager.add_turns,
                 actor_id=actor_id,
                 session_id=session_id,
                 messages=[
@@ -736,86 +1656,39 @@ class AgentCoreMemoryAPI:
                 ]
             )
 
-            yield self._send_event("log", "✅ 已存储，对话历史已更新")
-            time_module.sleep(0.05)
-
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            yield self._send_event("log", "✨ 提示: 助手能够记住之前的对话内容，体现了 STM 的会话内记忆能力")
+            logs.append("✅ 对话已存储，对话历史已更新")
 
-            yield self._send_event("result", {
-                "success": True,
+            return {
                 "user_message": user_message,
                 "assistant_response": assistant_response,
                 "context": context,
-                "elapsed_time": f"{total_elapsed:.2f}s",
                 "message": "从 STM 检索历史并回答"
-            })
+            }, "✨ 提示: 助手能够记住之前的对话内容，体现了 STM 的会话内记忆能力", [("STM 存储", store_future)]
 
-        except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"❌ 错误: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
-            yield self._send_event("result", {
-                "success": False,
-                "elapsed_time": f"{elapsed:.2f}s",
-                "message": f"错误: {str(e)}"
-            })
+        yield from self._run_turn_stream(
+            "🚀 开始 STM Demo - 步骤 2: 基于历史对话回答",
+            [(not self.stm_manager, "请先初始化 Memory Manager"),
+             (not session_id or not actor_id, "请先执行步骤 1")],
+            steps
+        )
 
-    def demo_ltm_step1_stream(self, user_preference: str, actor_id: str) -> Generator[str, None, None]:
+    def demo_ltm_step1_stream(self, user_preference: str, actor_id: str) -> Generator[bytes, None, None]:
         """LTM Demo - 步骤 1: 表达偏好 (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
-
-        try:
-            yield self._send_event("log", "🚀 开始 LTM Demo - 步骤 1: 表达偏好")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            if not self.ltm_manager:
-                yield self._send_event("log", "❌ 请先初始化 Memory Manager")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先初始化 Memory Manager"
-                })
-                return
-
+        def steps(logs):
             session_id = f"ltm-1-{int(time.time())}"
 
-            # 不再发送代码片段，页面已经有静态代码示例了
-            # 直接开始执行步骤
-
-            yield self._send_event("log", f"📝 用户偏好: {user_preference}")
-            yield self._send_event("log", f"👤 Actor ID: {actor_id}")
-            yield self._send_event("log", f"🔗 Session ID: {session_id}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 调用 LLM (流式响应)
-            yield self._send_event("log", "🤖 调用 LLM 生成回复...")
-            time_module.sleep(0.1)
-
-            api_start = time_module.time()
-            assistant_response = ""
-            for chunk in self.call_llm_stream(user_preference):
-                assistant_response += chunk
-                yield self._send_event("log", f"💬 {chunk}")
-            api_elapsed = time_module.time() - api_start
+            logs.append(f"📝 用户偏好: {user_preference}")
+            logs.append(f"👤 Actor ID: {actor_id}")
+            logs.append(f"🔗 Session ID: {session_id}")
+            logs.append("")
 
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"✅ LLM 回复完成")
-            yield self._send_event("log", f"   ⏱️  LLM 耗时: {api_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            assistant_response = yield from self._stream_llm_reply(logs, user_preference)
 
-            # 存储到 LTM
-            yield self._send_event("log", "💾 存储偏好到 LTM...")
-            time_module.sleep(0.1)
+            # 存储到 LTM (与后续日志并行，发送结果前确认)
+            logs.append("💾 存储偏好到 LTM...")
 
-            self.ltm_manager.add_turns(
+            store_future = self._submit(
+                self.ltm_manager.add_turns,
                 actor_id=actor_id,
                 session_id=session_id,
                 messages=[
@@ -824,77 +1697,37 @@ class AgentCoreMemoryAPI:
                 ]
             )
 
-            yield self._send_event("log", "✅ 已存储到 Long-term Memory")
-            yield self._send_event("log", f"📊 Session ID: {session_id}")
-            time_module.sleep(0.05)
-
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", "⏳ LTM 正在异步提取偏好信息，通常需要 10-15 秒...")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            yield self._send_event("log", "✨ 提示: 请等待约 15 秒后再执行步骤 2，以便 LTM 完成异步处理")
+            logs.append("✅ 已存储到 Long-term Memory")
+            logs.append(f"📊 Session ID: {session_id}")
+            logs.append("")
+            logs.append("⏳ LTM 正在异步提取偏好信息，通常需要 10-15 秒...")
 
-            yield self._send_event("result", {
-                "success": True,
+            return {
                 "session_id": session_id,
                 "actor_id": actor_id,
                 "user_preference": user_preference,
                 "assistant_response": assistant_response,
-                "elapsed_time": f"{total_elapsed:.2f}s",
                 "message": "已存储到 Long-term Memory，LTM 正在异步提取偏好信息（约需 10-15 秒）"
-            })
+            }, "✨ 提示: 请等待约 15 秒后再执行步骤 2，以便 LTM 完成异步处理", [("LTM 存储", store_future)]
 
-        except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"❌ 错误: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
-            yield self._send_event("result", {
-                "success": False,
-                "elapsed_time": f"{elapsed:.2f}s",
-                "message": f"错误: {str(e)}"
-            })
+        yield from self._run_turn_stream(
+            "🚀 开始 LTM Demo - 步骤 1: 表达偏好",
+            [(not self.ltm_manager, "请先初始化 Memory Manager")],
+            steps
+        )
 
-    def demo_ltm_step2_stream(self, user_question: str, actor_id: str) -> Generator[str, None, None]:
+    def demo_ltm_step2_stream(self, user_question: str, actor_id: str) -> Generator[bytes, None, None]:
         """LTM Demo - 步骤 2: 新会话中检索记忆 (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
-
-        try:
-            yield self._send_event("log", "🚀 开始 LTM Demo - 步骤 2: 新会话中检索记忆")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            if not self.ltm_manager:
-                yield self._send_event("log", "❌ 请先初始化 Memory Manager")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先初始化 Memory Manager"
-                })
-                return
-
-            if not actor_id:
-                yield self._send_event("log", "❌ 请先执行步骤 1")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先执行步骤 1"
-                })
-                return
-
+        def steps(logs):
             session_id = f"ltm-2-{int(time.time())}"
 
-            # 不再发送代码片段，页面已经有静态代码示例了
-            # 直接开始执行步骤
-
-            yield self._send_event("log", f"📝 用户问题: {user_question}")
-            yield self._send_event("log", f"🔗 新 Session ID: {session_id}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(f"📝 用户问题: {user_question}")
+            logs.append(f"🔗 新 Session ID: {session_id}")
+            logs.append("")
 
             # 从 LTM 检索相关记忆
-            yield self._send_event("log", "🔍 从 LTM 检索相关记忆...")
-            time_module.sleep(0.1)
+            logs.append("🔍 从 LTM 检索相关记忆...")
+            yield from self._flush_logs(logs)
 
             memories = self.ltm_manager.search_long_term_memories(
                 query=user_question,
@@ -907,11 +1740,7 @@ class AgentCoreMemoryAPI:
             memory_list = []
             if memories:
                 for i, memory in enumerate(memories, 1):
-                    content = memory.get('content', {})
-                    if isinstance(content, dict):
-                        text = content.get('text', '')
-                    else:
-                        text = str(content)
+                    text = _content_text(memory)
                     relevance = memory.get('relevanceScore', 0.0)
 
                     context_lines.append(f"{i}. {text}")
@@ -922,43 +1751,27 @@ class AgentCoreMemoryAPI:
 
             context = "\n".join(context_lines) if context_lines else ""
 
-            yield self._send_event("log", f"✅ 检索到 {len(memories)} 条相关记忆")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(f"✅ 检索到 {len(memories)} 条相关记忆")
+            logs.append("")
 
             # 显示记忆内容
             if memories:
-                yield self._send_event("log", "📜 检索到的长期记忆:")
-                for i, mem in enumerate(memory_list[:3], 1):
-                    yield self._send_event("log", f"  {i}. {mem['text'][:60]}... (相关性: {mem['relevance']:.2f})")
-                    time_module.sleep(0.05)
-                if len(memory_list) > 3:
-                    yield self._send_event("log", f"  ... (还有 {len(memory_list)-3} 条)")
-                yield self._send_event("log", "")
-                time_module.sleep(0.1)
-
-            # 调用 LLM (流式响应)
-            yield self._send_event("log", "🤖 调用 LLM 生成回复 (基于长期记忆)...")
-            time_module.sleep(0.1)
-
-            api_start = time_module.time()
-            assistant_response = ""
-            for chunk in self.call_llm_stream(user_question, context):
-                assistant_response += chunk
-                yield self._send_event("log", f"💬 {chunk}")
-            api_elapsed = time_module.time() - api_start
-
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"✅ LLM 回复完成")
-            yield self._send_event("log", f"   ⏱️  LLM 耗时: {api_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 存储新的对话
-            yield self._send_event("log", "💾 存储新对话到 LTM...")
-            time_module.sleep(0.1)
+                logs.append("📜 检索到的长期记忆:")
+                for i, mem in enumerate(memory_list[:LTM_LOG_DISPLAY_K], 1):
+                    logs.append(f"  {i}. {mem['text'][:60]}... (相关性: {mem['relevance']:.2f})")
+                if len(memory_list) > LTM_LOG_DISPLAY_K:
+                    logs.append(f"  ... (还有 {len(memory_list) - LTM_LOG_DISPLAY_K} 条)")
+                logs.append("")
+
+            assistant_response = yield from self._stream_llm_reply(
+                logs, user_question, context, "🤖 调用 LLM 生成回复 (基于长期记忆)..."
+            )
 
-            self.ltm_manager.add_turns(
+            # 存储新的对话 (与后续日志并行，发送结果前确认)
+            logs.append("💾 存储新对话到 LTM...")
+
+            store_future = self._submit(
+                self.ltm_manager.add_turns,
                 actor_id=actor_id,
                 session_id=session_id,
                 messages=[
@@ -967,330 +1780,187 @@ class AgentCoreMemoryAPI:
                 ]
             )
 
-            yield self._send_event("log", "✅ 已存储，跨会话记忆功能展示完成")
-            time_module.sleep(0.05)
+            logs.append("✅ 对话已存储，跨会话记忆功能展示完成")
 
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            yield self._send_event("log", "✨ 提示: 即使在新会话中，助手仍能记住之前表达的偏好，这就是 LTM 的跨会话记忆能力")
-
-            yield self._send_event("result", {
-                "success": True,
+            return {
                 "session_id": session_id,
                 "user_question": user_question,
                 "assistant_response": assistant_response,
                 "memories": memory_list,
                 "memory_count": len(memories),
-                "elapsed_time": f"{total_elapsed:.2f}s",
                 "message": f"从 LTM 检索到 {len(memories)} 条相关记忆"
-            })
+            }, "✨ 提示: 即使在新会话中，助手仍能记住之前表达的偏好，这就是 LTM 的跨会话记忆能力", [("LTM 存储", store_future)]
 
-        except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"❌ 错误: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
-            yield self._send_event("result", {
-                "success": False,
-                "elapsed_time": f"{elapsed:.2f}s",
-                "message": f"错误: {str(e)}"
-            })
+        yield from self._run_turn_stream(
+            "🚀 开始 LTM Demo - 步骤 2: 新会话中检索记忆",
+            [(not self.ltm_manager, "请先初始化 Memory Manager"),
+             (not actor_id, "请先执行步骤 1")],
+            steps
+        )
 
-    def demo_combined_stream(self, user_question: str, actor_id: str) -> Generator[str, None, None]:
+    def demo_combined_stream(self, user_question: str, actor_id: str) -> Generator[bytes, None, None]:
         """Combined Demo: STM + LTM (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
-
-        try:
-            yield self._send_event("log", "🚀 开始 Combined Demo: STM + LTM 综合演示")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            if not self.stm_manager or not self.ltm_manager:
-                yield self._send_event("log", "❌ 请先初始化 Memory Manager")
-                yield self._send_event("result", {
-                    "success": False,
-                    "message": "请先初始化 Memory Manager"
-                })
-                return
-
+        def steps(logs):
             session_id = f"combined-{int(time.time())}"
 
-            # 不再发送代码片段，页面已经有静态代码示例了
-            # 直接开始执行步骤
-
-            yield self._send_event("log", f"📝 用户问题: {user_question}")
-            yield self._send_event("log", f"🔗 Session ID: {session_id}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append(f"📝 用户问题: {user_question}")
+            logs.append(f"🔗 Session ID: {session_id}")
+            logs.append("")
 
-            # 1. 从 LTM 获取长期记忆
-            yield self._send_event("log", "🔍 从 LTM 检索长期记忆...")
-            time_module.sleep(0.1)
+            # 1. 从 LTM 获取长期记忆, 2. 从 STM 获取会话历史 (并行请求)
+            logs.append("🔍 从 LTM 检索长期记忆...")
+            logs.append("🔍 从 STM 检索会话历史...")
+            yield from self._flush_logs(logs)
 
-            ltm_memories = self.ltm_manager.search_long_term_memories(
+            ltm_future = self._submit(
+                self.ltm_manager.search_long_term_memories,
                 query=user_question,
                 namespace_prefix="/",
                 top_k=3
             )
+            stm_future = self._submit(
+                self.stm_manager.get_last_k_turns,
+                actor_id=actor_id,
+                session_id=session_id,
+                k=3
+            )
 
-            yield self._send_event("log", f"✅ 检索到 {len(ltm_memories)} 条长期记忆")
-            time_module.sleep(0.05)
-
-            # 2. 从 STM 获取会话历史
-            yield self._send_event("log", "🔍 从 STM 检索会话历史...")
-            time_module.sleep(0.1)
-
+            # Report each retrieval as soon as it returns
+            ltm_memories = []
             stm_turns = []
-            try:
-                stm_turns = self.stm_manager.get_last_k_turns(
-                    actor_id=actor_id,
-                    session_id=session_id,
-                    k=3
-                )
-                yield self._send_event("log", f"✅ 检索到 {len(stm_turns)} 轮会话历史")
-            except:
-                yield self._send_event("log", "⚠️  当前会话暂无历史记录")
+            for future in as_completed((ltm_future, stm_future)):
+                if future is ltm_future:
+                    ltm_memories = future.result()
+                    logs.append(f"✅ 检索到 {len(ltm_memories)} 条长期记忆")
+                else:
+                    try:
+                        stm_turns = future.result()
+                        logs.append(f"✅ 检索到 {len(stm_turns)} 轮会话历史")
+                    except Exception:
+                        logs.append("⚠️  当前会话暂无历史记录")
+                yield from self._flush_logs(logs)
 
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append("")
 
             # 3. 构建综合上下文
-            yield self._send_event("log", "🔧 构建综合上下文...")
-            time_module.sleep(0.1)
-
-            context_parts = []
-            ltm_list = []
-            stm_list = []
-
-            if ltm_memories:
-                ltm_lines = []
-                for memory in ltm_memories:
-                    content = memory.get('content', {})
-                    if isinstance(content, dict):
-                        text = content.get('text', '')
-                    else:
-                        text = str(content)
-                    ltm_lines.append(f"- {text}")
-                    ltm_list.append(text)
-
-                if ltm_lines:
-                    context_parts.append("长期记忆 (跨会话):\n" + "\n".join(ltm_lines))
-
-            if stm_turns:
-                stm_lines = []
-                for turn in stm_turns:
-                    for msg in turn:
-                        role = "用户" if msg.get('role') == MessageRole.USER.value else "助手"
-                        text = msg.get('content', {}).get('text', '')
-                        stm_lines.append(f"{role}: {text}")
-                        stm_list.append({"role": role, "text": text})
-
-                if stm_lines:
-                    context_parts.append("会话历史 (当前会话):\n" + "\n".join(stm_lines))
-
-            context = "\n\n".join(context_parts)
-
-            yield self._send_event("log", "✅ 综合上下文构建完成")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append("🔧 构建综合上下文...")
+
+            ltm_list = [_content_text(memory) for memory in ltm_memories or []]
+            stm_pairs = list(_iter_turn_messages(stm_turns or []))
+            stm_list = [{"role": role, "text": text} for role, text in stm_pairs]
+            context = _combined_context(ltm_list, stm_pairs)
+
+            logs.append("✅ 综合上下文构建完成")
+            logs.append("")
 
             # 4. 调用 LLM (流式响应)
-            yield self._send_event("log", "🤖 调用 LLM 生成回复 (基于综合记忆)...")
-            time_module.sleep(0.1)
-
-            api_start = time_module.time()
-            assistant_response = ""
-            for chunk in self.call_llm_stream(user_question, context):
-                assistant_response += chunk
-                yield self._send_event("log", f"💬 {chunk}")
-            api_elapsed = time_module.time() - api_start
-
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"✅ LLM 回复完成")
-            yield self._send_event("log", f"   ⏱️  LLM 耗时: {api_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-
-            # 5. 同时存储到 STM 和 LTM
-            yield self._send_event("log", "💾 存储对话到 STM 和 LTM...")
-            time_module.sleep(0.1)
+            assistant_response = yield from self._stream_llm_reply(
+                logs, user_question, context, "🤖 调用 LLM 生成回复 (基于综合记忆)..."
+            )
+
+            # 5. 同时存储到 STM 和 LTM (并行写入)
+            logs.append("💾 存储对话到 STM 和 LTM...")
+            yield from self._flush_logs(logs)
 
             messages = [
                 ConversationalMessage(user_question, MessageRole.USER),
                 ConversationalMessage(assistant_response, MessageRole.ASSISTANT)
             ]
 
-            self.stm_manager.add_turns(
-                actor_id=actor_id,
-                session_id=session_id,
-                messages=messages
-            )
-
-            self.ltm_manager.add_turns(
-                actor_id=actor_id,
-                session_id=session_id,
-                messages=messages
-            )
-
-            yield self._send_event("log", "✅ 已同时存储到 STM 和 LTM")
-            time_module.sleep(0.05)
+            store_futures = {
+                name: self._submit(manager.add_turns, actor_id=actor_id, session_id=session_id, messages=messages)
+                for name, manager in (("STM", self.stm_manager), ("LTM", self.ltm_manager))
+            }
+            wait(store_futures.values())
 
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            yield self._send_event("log", "")
-            yield self._send_event("log", "✨ 综合演示完成: 利用了短期记忆和长期记忆的优势")
+            # One store failing does not abort the other; report each separately
+            store_errors = {name: future.exception() for name, future in store_futures.items() if future.exception()}
+            for name, error in store_errors.items():
+                logs.append(f"⚠️  {name} 存储失败: {str(error)}")
+            if not store_errors:
+                logs.append("✅ 已同时存储到 STM 和 LTM")
 
-            yield self._send_event("result", {
-                "success": True,
+            return {
                 "session_id": session_id,
                 "user_question": user_question,
                 "assistant_response": assistant_response,
                 "ltm_memories": ltm_list,
                 "stm_history": stm_list,
-                "elapsed_time": f"{total_elapsed:.2f}s",
                 "message": "综合使用 STM + LTM"
-            })
+            }, "✨ 综合演示完成: 利用了短期记忆和长期记忆的优势", []
 
-        except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"❌ 错误: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
-            yield self._send_event("result", {
-                "success": False,
-                "elapsed_time": f"{elapsed:.2f}s",
-                "message": f"错误: {str(e)}"
-            })
+        yield from self._run_turn_stream(
+            "🚀 开始 Combined Demo: STM + LTM 综合演示",
+            [(not self.stm_manager or not self.ltm_manager, "请先初始化 Memory Manager")],
+            steps
+        )
 
-    def create_stm_memory_stream(self, name: str = None) -> Generator[str, None, None]:
+    def create_stm_memory_stream(self, name: str = None) -> Generator[bytes, None, None]:
         """创建 Short-Term Memory (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
+        start_time = time.monotonic()
+        logs = []
 
         try:
-            yield self._send_event("log", "🚀 开始创建 Short-Term Memory (STM)")
-            yield self._send_event("log", f"⏱️  开始时间: {datetime.now().strftime('%H:%M:%S')}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)  # 确保流式输出
+            logs.append("🚀 开始创建 Short-Term Memory (STM)")
+            logs.append(f"⏱️  开始时间: {time.strftime('%H:%M:%S')}")
+            logs.append("")
 
             if not self.memory_client:
-                yield self._send_event("log", "📡 初始化 MemoryClient...")
-                time_module.sleep(0.1)
-                self.memory_client = MemoryClient(region_name=self.region_name)
-                elapsed = time_module.time() - start_time
-                yield self._send_event("log", f"✅ MemoryClient 初始化成功 (region: {self.region_name}) [{elapsed:.2f}s]")
-                time_module.sleep(0.1)
+                logs.append("📡 初始化 MemoryClient...")
+                yield from self._flush_logs(logs)
+                self.memory_client = _get_memory_client(self.region_name)
+                elapsed = time.monotonic() - start_time
+                logs.append(f"✅ MemoryClient 初始化成功 (region: {self.region_name}) [{elapsed:.2f}s]")
 
             if not name:
                 name = f"AgentCore_STM_Demo_{uuid.uuid4().hex[:8]}"
-                elapsed = time_module.time() - start_time
-                yield self._send_event("log", f"📝 生成 Memory 名称: {name} [{elapsed:.2f}s]")
-                time_module.sleep(0.1)
+                logs.append(f"📝 生成 Memory 名称: {name}")
 
             # 构建代码片段
-            code_snippet = f'''import time
-from datetime import datetime
-from bedrock_agentcore.memory import MemoryClient
-
-print("🚀 开始创建 Short-Term Memory (STM)")
-print(f"⏱️  开始时间: {{datetime.now().strftime('%H:%M:%S')}}")
-print()
+            code_snippet = _build_memory_code_snippet("stm", name, self.region_name)
 
-start_time = time.time()
+            # The intro logs, the code frame and the pre-create logs go out in one write
+            frames = [self._log_event(logs), self._send_event("code", code_snippet)]
+            logs.clear()
 
-# 初始化 Memory Client
-print("📡 初始化 MemoryClient...")
-client = MemoryClient(region_name="{self.region_name}")
-elapsed = time.time() - start_time
-print(f"✅ MemoryClient 初始化成功 (region: {self.region_name}) [{{elapsed:.2f}}s]")
-
-# 生成 Memory 名称
-print(f"📝 生成 Memory 名称: {name}")
-print()
-
-# 创建 STM (不配置策略)
-print("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
-print(f"   - 名称: {name}")
-print("   - 策略: 无 (STM 不需要提取策略)")
-print("   - 事件保留期: 7 天")
-print()
-
-elapsed = time.time() - start_time
-print(f"⏳ 正在创建，请稍候... [{{elapsed:.2f}}s]")
-
-api_start = time.time()
-stm = client.create_memory_and_wait(
-    name="{name}",
-    strategies=[],  # 空列表 = 不配置提取策略
-    description="Short-term memory demo - 仅存储原始对话",
-    event_expiry_days=7  # 保存7天
-)
-api_elapsed = time.time() - api_start
-
-print()
-print("✅ STM 创建成功!")
-print(f"   - Memory ID: {{stm['id']}}")
-print(f"   - 状态: {{stm.get('status', 'ACTIVE')}}")
-print(f"   - 创建时间: {{stm.get('createdAt', 'N/A')}}")
-print(f"   - API 耗时: {{api_elapsed:.2f}}秒")
+            logs.append("")
+            logs.append("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
+            logs.append(f"   - 名称: {name}")
+            logs.append(f"   - 策略: 无 (STM 不需要提取策略)")
+            logs.append(f"   - 事件保留期: 7 天")
+            logs.append("")
 
-total_elapsed = time.time() - start_time
-print()
-print(f"⏱️  总耗时: {{total_elapsed:.2f}}秒")
-print()
-print("💡 提示: STM 适用于会话内的短期记忆，即时存储，无需等待")'''
-
-            yield self._send_event("code", code_snippet)
-            time_module.sleep(0.1)
-
-            yield self._send_event("log", "")
-            yield self._send_event("log", "⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
-            time_module.sleep(0.1)
-            yield self._send_event("log", f"   - 名称: {name}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 策略: 无 (STM 不需要提取策略)")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 事件保留期: 7 天")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "")
-
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", f"⏳ 正在创建，请稍候... [{elapsed:.2f}s]")
-            time_module.sleep(0.1)
+            elapsed = time.monotonic() - start_time
+            logs.append(f"⏳ 正在创建，请稍候... [{elapsed:.2f}s]")
+            frames.append(self._log_event(logs))
+            logs.clear()
+            yield b"".join(frames)
 
             # 创建不带策略的 Memory
-            api_start = time_module.time()
-            stm = self.memory_client.create_memory_and_wait(
+            api_start = time.monotonic()
+            stm = yield from self._wait_with_heartbeat(self._create_wait_pool.submit(
+                self.memory_client.create_memory_and_wait,
                 name=name,
                 strategies=[],
                 description="Short-term memory demo - 仅存储原始对话",
                 event_expiry_days=7
-            )
-            api_elapsed = time_module.time() - api_start
-
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-            yield self._send_event("log", f"✅ STM 创建成功!")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - Memory ID: {stm['id']}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 状态: {stm.get('status', 'ACTIVE')}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 创建时间: {stm.get('createdAt', 'N/A')}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - API 耗时: {api_elapsed:.2f}秒")
-            time_module.sleep(0.05)
-
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "")
-            yield self._send_event("log", "💡 提示: STM 适用于会话内的短期记忆，即时存储，无需等待")
+            ))
+            self._invalidate_list_cache()
+            api_elapsed = time.monotonic() - api_start
+
+            logs.append("")
+            logs.append(f"✅ STM 创建成功!")
+            logs.append(f"   - Memory ID: {stm['id']}")
+            logs.append(f"   - 状态: {stm.get('status', 'ACTIVE')}")
+            logs.append(f"   - 创建时间: {stm.get('createdAt', 'N/A')}")
+            logs.append(f"   - API 耗时: {api_elapsed:.2f}秒")
+
+            total_elapsed = time.monotonic() - start_time
+            logs.append("")
+            logs.append(f"⏱️  总耗时: {total_elapsed:.2f}秒")
+            logs.append("")
+            logs.append("💡 提示: STM 适用于会话内的短期记忆，即时存储，无需等待")
+            yield from self._flush_logs(logs)
 
             yield self._send_event("result", {
                 "success": True,
@@ -1301,209 +1971,90 @@ print("💡 提示: STM 适用于会话内的短期记忆，即时存储，无
             })
 
         except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", f"")
-            yield self._send_event("log", f"❌ STM 创建失败: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
+            elapsed = time.monotonic() - start_time
+            logs.append(f"")
+            logs.append(f"❌ STM 创建失败: {str(e)}")
+            logs.append(f"⏱️  失败耗时: {elapsed:.2f}秒")
+            yield from self._flush_logs(logs)
             yield self._send_event("result", {
                 "success": False,
                 "elapsed_time": f"{elapsed:.2f}s",
                 "message": f"STM 创建失败: {str(e)}"
             })
 
-    def create_ltm_memory_stream(self, name: str = None) -> Generator[str, None, None]:
+    def create_ltm_memory_stream(self, name: str = None) -> Generator[bytes, None, None]:
         """创建 Long-Term Memory (流式输出)"""
-        import time as time_module
-        start_time = time_module.time()
+        start_time = time.monotonic()
+        logs = []
 
         try:
-            yield self._send_event("log", "🚀 开始创建 Long-Term Memory (LTM)")
-            yield self._send_event("log", f"⏱️  开始时间: {datetime.now().strftime('%H:%M:%S')}")
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
+            logs.append("🚀 开始创建 Long-Term Memory (LTM)")
+            logs.append(f"⏱️  开始时间: {time.strftime('%H:%M:%S')}")
+            logs.append("")
 
             if not self.memory_client:
-                yield self._send_event("log", "📡 初始化 MemoryClient...")
-                time_module.sleep(0.1)
-                self.memory_client = MemoryClient(region_name=self.region_name)
-                elapsed = time_module.time() - start_time
-                yield self._send_event("log", f"✅ MemoryClient 初始化成功 (region: {self.region_name}) [{elapsed:.2f}s]")
-                time_module.sleep(0.1)
+                logs.append("📡 初始化 MemoryClient...")
+                yield from self._flush_logs(logs)
+                self.memory_client = _get_memory_client(self.region_name)
+                elapsed = time.monotonic() - start_time
+                logs.append(f"✅ MemoryClient 初始化成功 (region: {self.region_name}) [{elapsed:.2f}s]")
 
             if not name:
                 name = f"AgentCore_LTM_Demo_{uuid.uuid4().hex[:8]}"
-                elapsed = time_module.time() - start_time
-                yield self._send_event("log", f"📝 生成 Memory 名称: {name} [{elapsed:.2f}s]")
-                time_module.sleep(0.1)
+                logs.append(f"📝 生成 Memory 名称: {name}")
 
             # 构建代码片段
-            code_snippet = f'''import time
-from datetime import datetime
-from bedrock_agentcore.memory import MemoryClient
-
-print("🚀 开始创建 Long-Term Memory (LTM)")
-print(f"⏱️  开始时间: {{datetime.now().strftime('%H:%M:%S')}}")
-print()
-
-start_time = time.time()
-
-# 初始化 Memory Client
-print("📡 初始化 MemoryClient...")
-client = MemoryClient(region_name="{self.region_name}")
-elapsed = time.time() - start_time
-print(f"✅ MemoryClient 初始化成功 (region: {self.region_name}) [{{elapsed:.2f}}s]")
-
-# 生成 Memory 名称
-print(f"📝 生成 Memory 名称: {name}")
-print()
-
-# 创建 LTM (配置语义和偏好策略)
-print("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
-print(f"   - 名称: {name}")
-print("   - 策略: 2 个 (语义记忆 + 用户偏好)")
-print("   - 事件保留期: 30 天")
-print()
-print("⚙️ 配置策略 1: Semantic Memory Strategy")
-print("   - 自动提取重要事实和信息")
-print("   - 使用 LLM 进行语义分析")
-print()
-print("⚙️ 配置策略 2: User Preference Memory Strategy")
-print("   - 自动提取用户偏好")
-print("   - 支持跨会话记忆")
-print()
+            code_snippet = _build_memory_code_snippet("ltm", name, self.region_name)
 
-elapsed = time.time() - start_time
-print(f"⏳ 正在创建并配置策略，请稍候... [{{elapsed:.2f}}s]")
+            # The intro logs, the code frame and the pre-create logs go out in one write
+            frames = [self._log_event(logs), self._send_event("code", code_snippet)]
+            logs.clear()
 
-api_start = time.time()
-ltm = client.create_memory_and_wait(
-    name="{name}",
-    strategies=[
-        # 语义记忆策略: 提取重要的事实和信息
-        {{
-            "semanticMemoryStrategy": {{
-                "name": "semantic_facts",
-                "description": "提取用户提到的重要事实和信息",
-                "namespaces": ["/strategies/{{memoryStrategyId}}/actors/{{actorId}}"]
-            }}
-        }},
-        # 用户偏好策略: 提取用户的喜好和偏好
-        {{
-            "userPreferenceMemoryStrategy": {{
-                "name": "user_preferences",
-                "description": "提取用户的偏好、喜好和习惯",
-                "namespaces": ["/strategies/{{memoryStrategyId}}/actors/{{actorId}}"]
-            }}
-        }}
-    ],
-    description="Long-term memory demo - 智能提取和跨会话记忆",
-    event_expiry_days=30  # 保存30天
-)
-api_elapsed = time.time() - api_start
-
-print()
-print("✅ LTM 创建成功!")
-print(f"   - Memory ID: {{ltm['id']}}")
-print(f"   - 状态: {{ltm.get('status', 'ACTIVE')}}")
-print(f"   - 创建时间: {{ltm.get('createdAt', 'N/A')}}")
-print(f"   - 策略: (查看详细信息)")
-print(f"   - API 耗时: {{api_elapsed:.2f}}秒")
+            logs.append("")
+            logs.append("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
+            logs.append(f"   - 名称: {name}")
+            logs.append(f"   - 策略: 2 个 (语义记忆 + 用户偏好)")
+            logs.append(f"   - 事件保留期: 30 天")
+            logs.append("")
+            logs.extend(_LTM_STRATEGY_LOG_LINES)
+            logs.append("")
 
-total_elapsed = time.time() - start_time
-print()
-print(f"⏱️  总耗时: {{total_elapsed:.2f}}秒")
-print()
-print("💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")'''
-
-            yield self._send_event("code", code_snippet)
-            time_module.sleep(0.1)
-
-            yield self._send_event("log", "")
-            yield self._send_event("log", "⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
-            time_module.sleep(0.1)
-            yield self._send_event("log", f"   - 名称: {name}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 策略: 2 个 (语义记忆 + 用户偏好)")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 事件保留期: 30 天")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "")
-            yield self._send_event("log", "⚙️ 配置策略 1: Semantic Memory Strategy")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "   - 自动提取重要事实和信息")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "   - 使用 LLM 进行语义分析")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "")
-            yield self._send_event("log", "⚙️ 配置策略 2: User Preference Memory Strategy")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "   - 自动提取用户偏好")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "   - 支持跨会话记忆")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "")
-
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", f"⏳ 正在创建并配置策略，请稍候... [{elapsed:.2f}s]")
-            time_module.sleep(0.1)
+            elapsed = time.monotonic() - start_time
+            logs.append(f"⏳ 正在创建并配置策略，请稍候... [{elapsed:.2f}s]")
+            frames.append(self._log_event(logs))
+            logs.clear()
+            yield b"".join(frames)
 
             # 创建带策略的 Memory
-            api_start = time_module.time()
-            ltm = self.memory_client.create_memory_and_wait(
+            api_start = time.monotonic()
+            ltm = yield from self._wait_with_heartbeat(self._create_wait_pool.submit(
+                self.memory_client.create_memory_and_wait,
                 name=name,
-                strategies=[
-                    {
-                        "semanticMemoryStrategy": {
-                            "name": "semantic_facts",
-                            "description": "提取用户提到的重要事实和信息",
-                            "namespaces": ["/strategies/{memoryStrategyId}/actors/{actorId}"]
-                        }
-                    },
-                    {
-                        "userPreferenceMemoryStrategy": {
-                            "name": "user_preferences",
-                            "description": "提取用户的偏好、喜好和习惯",
-                            "namespaces": ["/strategies/{memoryStrategyId}/actors/{actorId}"]
-                        }
-                    }
-                ],
+                strategies=_LTM_STRATEGIES,
                 description="Long-term memory demo - 智能提取和跨会话记忆",
                 event_expiry_days=30
-            )
-            api_elapsed = time_module.time() - api_start
-
-            yield self._send_event("log", "")
-            time_module.sleep(0.1)
-            yield self._send_event("log", f"✅ LTM 创建成功!")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - Memory ID: {ltm['id']}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 状态: {ltm.get('status', 'ACTIVE')}")
-            time_module.sleep(0.05)
-            yield self._send_event("log", f"   - 创建时间: {ltm.get('createdAt', 'N/A')}")
-            time_module.sleep(0.05)
+            ))
+            self._invalidate_list_cache()
+            api_elapsed = time.monotonic() - api_start
+
+            logs.append("")
+            logs.append(f"✅ LTM 创建成功!")
+            logs.append(f"   - Memory ID: {ltm['id']}")
+            logs.append(f"   - 状态: {ltm.get('status', 'ACTIVE')}")
+            logs.append(f"   - 创建时间: {ltm.get('createdAt', 'N/A')}")
 
             # 提取策略信息
-            strategies = []
-            for strategy in ltm.get('strategies', []):
-                strategy_info = {
-                    "name": strategy.get('name', 'N/A'),
-                    "type": strategy.get('type', 'N/A'),
-                    "strategy_id": strategy.get('strategyId', 'N/A')
-                }
-                strategies.append(strategy_info)
-                yield self._send_event("log", f"   - 策略: {strategy_info['name']} ({strategy_info['type']})")
-                time_module.sleep(0.05)
+            strategies = _strategy_summaries(ltm)
+            logs.extend(f"   - 策略: {info['name']} ({info['type']})" for info in strategies)
 
-            yield self._send_event("log", f"   - API 耗时: {api_elapsed:.2f}秒")
-            time_module.sleep(0.05)
+            logs.append(f"   - API 耗时: {api_elapsed:.2f}秒")
 
-            total_elapsed = time_module.time() - start_time
-            yield self._send_event("log", "")
-            yield self._send_event("log", f"⏱️  总耗时: {total_elapsed:.2f}秒")
-            time_module.sleep(0.05)
-            yield self._send_event("log", "")
-            yield self._send_event("log", "💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")
+            total_elapsed = time.monotonic() - start_time
+            logs.append("")
+            logs.append(f"⏱️  总耗时: {total_elapsed:.2f}秒")
+            logs.append("")
+            logs.append("💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")
+            yield from self._flush_logs(logs)
 
             yield self._send_event("result", {
                 "success": True,
@@ -1515,40 +2066,72 @@ print("💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")''
             })
 
         except Exception as e:
-            elapsed = time_module.time() - start_time
-            yield self._send_event("log", f"")
-            yield self._send_event("log", f"❌ LTM 创建失败: {str(e)}")
-            yield self._send_event("log", f"⏱️  失败耗时: {elapsed:.2f}秒")
+            elapsed = time.monotonic() - start_time
+            logs.append(f"")
+            logs.append(f"❌ LTM 创建失败: {str(e)}")
+            logs.append(f"⏱️  失败耗时: {elapsed:.2f}秒")
+            yield from self._flush_logs(logs)
             yield self._send_event("result", {
                 "success": False,
                 "elapsed_time": f"{elapsed:.2f}s",
                 "message": f"LTM 创建失败: {str(e)}"
             })
 
-    def _send_event(self, event_type: str, data: Any) -> str:
-        """格式化SSE事件"""
+    def _store_in_background(self, manager, actor_id: str, session_id: str, messages: list):
+        """Submit add_turns without waiting, so the response does not pay the store round-trip"""
+        future = self._submit(manager.add_turns, actor_id=actor_id, session_id=session_id, messages=messages)
+        future.add_done_callback(_log_store_failure)
+        return future
+
+    def _wait_with_heartbeat(self, future) -> Generator[bytes, None, Any]:
+        """Wait for a blocking call, sending SSE heartbeats while it runs; returns its result"""
+        while True:
+            try:
+                return future.result(timeout=HEARTBEAT_SECONDS)
+            except FutureTimeoutError:
+                if future.done():  # the call itself raised a timeout
+                    raise
+                yield _HEARTBEAT_FRAME
+
+    def _flush_logs(self, logs: List[str]) -> Generator[bytes, None, None]:
+        """Send buffered log lines as a single multi-line SSE frame"""
+        if logs:
+            yield self._log_event(logs)
+            logs.clear()
+            if STREAM_PACE_SECONDS:
+                time.sleep(STREAM_PACE_SECONDS)
+
+    def _log_event(self, lines: List[str]) -> bytes:
+        """Format log lines as one SSE log event (no JSON or type dispatch)"""
+        # Lines may carry embedded newlines (memory text, errors), so prefix
+        # after joining rather than joining on the prefix
+        return ("event: log\ndata: " + "\n".join(lines).replace("\n", "\ndata: ") + "\n\n").encode()
+
+    def _send_event(self, event_type: str, data: Any) -> bytes:
+        """格式化SSE事件 (UTF-8 编码, StreamingResponse 直接写出)"""
         if isinstance(data, (dict, list)):
-            data_str = json.dumps(data, ensure_ascii=False)
+            data_str = _dumps(data)
         else:
             data_str = str(data)
 
         # SSE协议：多行数据时，每行都需要 "data: " 前缀
-        lines = data_str.split('\n')
-        data_lines = '\n'.join(f"data: {line}" for line in lines)
+        data_lines = "data: " + data_str.replace("\n", "\ndata: ")
 
-        return f"event: {event_type}\n{data_lines}\n\n"
+        return f"event: {event_type}\n{data_lines}\n\n".encode()
 
-    def create_stm_memory(self, name: str = None) -> Dict[str, Any]:
+    def create_stm_memory(self, name: str = None, profile: Optional[bool] = None) -> Dict[str, Any]:
         """创建 Short-Term Memory (不配置策略)"""
         logs = []
         code_snippet = ""
+        timings = {} if (PROFILE_AWS_CALLS if profile is None else profile) else None
 
         try:
             logs.append("🚀 开始创建 Short-Term Memory (STM)")
 
             if not self.memory_client:
                 logs.append("📡 初始化 MemoryClient...")
-                self.memory_client = MemoryClient(region_name=self.region_name)
+                with _PerfSpan(timings, "memory_client_init"):
+                    self.memory_client = _get_memory_client(self.region_name)
                 logs.append(f"✅ MemoryClient 初始化成功 (region: {self.region_name})")
 
             if not name:
@@ -1556,40 +2139,35 @@ print("💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")''
                 logs.append(f"📝 生成 Memory 名称: {name}")
 
             # 构建代码片段
-            code_snippet = f'''from bedrock_agentcore.memory import MemoryClient
+            code_snippet = _build_memory_code_snippet("stm", name, self.region_name, streaming=False)
 
-# 初始化 Memory Client
-client = MemoryClient(region_name="{self.region_name}")
-
-# 创建 STM (不配置策略)
-stm = client.create_memory_and_wait(
-    name="{name}",
-    strategies=[],  # 空列表 = 不配置提取策略
-    description="Short-term memory demo - 仅存储原始对话",
-    event_expiry_days=7  # 保存7天
-)
-
-print(f"STM 创建成功: {{stm['id']}}")'''
-
-            logs.append("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
-            logs.append(f"   - 名称: {name}")
-            logs.append(f"   - 策略: 无 (STM 不需要提取策略)")
-            logs.append(f"   - 事件保留期: 7 天")
+            if VERBOSE_LOGS:
+                logs.extend((
+                    "⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...",
+                    f"   - 名称: {name}",
+                    "   - 策略: 无 (STM 不需要提取策略)",
+                    "   - 事件保留期: 7 天",
+                ))
 
             # 创建不带策略的 Memory
-            stm = self.memory_client.create_memory_and_wait(
-                name=name,
-                strategies=[],  # 空列表 = 不配置提取策略
-                description="Short-term memory demo - 仅存储原始对话",
-                event_expiry_days=7  # 保存7天
-            )
-
-            logs.append(f"✅ STM 创建成功!")
-            logs.append(f"   - Memory ID: {stm['id']}")
-            logs.append(f"   - 状态: {stm.get('status', 'ACTIVE')}")
-            logs.append(f"   - 创建时间: {stm.get('createdAt', 'N/A')}")
-            logs.append("")
-            logs.append("💡 提示: STM 适用于会话内的短期记忆，即时存储，无需等待")
+            with _PerfSpan(timings, "create_memory_and_wait"):
+                stm = self.memory_client.create_memory_and_wait(
+                    name=name,
+                    strategies=[],  # 空列表 = 不配置提取策略
+                    description="Short-term memory demo - 仅存储原始对话",
+                    event_expiry_days=7  # 保存7天
+                )
+            self._invalidate_list_cache()
+
+            logs.append("✅ STM 创建成功!")
+            if VERBOSE_LOGS:
+                logs.extend((
+                    f"   - Memory ID: {stm['id']}",
+                    f"   - 状态: {stm.get('status', 'ACTIVE')}",
+                    f"   - 创建时间: {stm.get('createdAt', 'N/A')}",
+                    "",
+                    "💡 提示: STM 适用于会话内的短期记忆，即时存储，无需等待",
+                ))
 
             return {
                 "success": True,
@@ -1597,7 +2175,8 @@ print(f"STM 创建成功: {{stm['id']}}")'''
                 "name": stm['name'],
                 "code": code_snippet,
                 "logs": logs,
-                "message": f"STM 创建成功: {stm['id']}"
+                "message": f"STM 创建成功: {stm['id']}",
+                **({"timings": timings} if timings is not None else {})
             }
 
         except Exception as e:
@@ -1606,20 +2185,24 @@ print(f"STM 创建成功: {{stm['id']}}")'''
                 "success": False,
                 "message": f"STM 创建失败: {str(e)}",
                 "code": code_snippet,
-                "logs": logs
+                "logs": logs,
+                **_aws_error_fields(e),
+                **({"timings": timings} if timings is not None else {})
             }
 
-    def create_ltm_memory(self, name: str = None) -> Dict[str, Any]:
+    def create_ltm_memory(self, name: str = None, profile: Optional[bool] = None) -> Dict[str, Any]:
         """创建 Long-Term Memory (配置语义和偏好策略)"""
         logs = []
         code_snippet = ""
+        timings = {} if (PROFILE_AWS_CALLS if profile is None else profile) else None
 
         try:
             logs.append("🚀 开始创建 Long-Term Memory (LTM)")
 
             if not self.memory_client:
                 logs.append("📡 初始化 MemoryClient...")
-                self.memory_client = MemoryClient(region_name=self.region_name)
+                with _PerfSpan(timings, "memory_client_init"):
+                    self.memory_client = _get_memory_client(self.region_name)
                 logs.append(f"✅ MemoryClient 初始化成功 (region: {self.region_name})")
 
             if not name:
@@ -1627,95 +2210,40 @@ print(f"STM 创建成功: {{stm['id']}}")'''
                 logs.append(f"📝 生成 Memory 名称: {name}")
 
             # 构建代码片段
-            code_snippet = f'''from bedrock_agentcore.memory import MemoryClient
-
-# 初始化 Memory Client
-client = MemoryClient(region_name="{self.region_name}")
-
-# 创建 LTM (配置语义和偏好策略)
-ltm = client.create_memory_and_wait(
-    name="{name}",
-    strategies=[
-        # 语义记忆策略: 提取重要的事实和信息
-        {{
-            "semanticMemoryStrategy": {{
-                "name": "semantic_facts",
-                "description": "提取用户提到的重要事实和信息",
-                "namespaces": ["/strategies/{{memoryStrategyId}}/actors/{{actorId}}"]
-            }}
-        }},
-        # 用户偏好策略: 提取用户的喜好和偏好
-        {{
-            "userPreferenceMemoryStrategy": {{
-                "name": "user_preferences",
-                "description": "提取用户的偏好、喜好和习惯",
-                "namespaces": ["/strategies/{{memoryStrategyId}}/actors/{{actorId}}"]
-            }}
-        }}
-    ],
-    description="Long-term memory demo - 智能提取和跨会话记忆",
-    event_expiry_days=30  # 保存30天
-)
-
-print(f"LTM 创建成功: {{ltm['id']}}")'''
-
-            logs.append("⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...")
-            logs.append(f"   - 名称: {name}")
-            logs.append(f"   - 策略: 2 个 (语义记忆 + 用户偏好)")
-            logs.append(f"   - 事件保留期: 30 天")
-            logs.append("")
-            logs.append("⚙️ 配置策略 1: Semantic Memory Strategy")
-            logs.append("   - 自动提取重要事实和信息")
-            logs.append("   - 使用 LLM 进行语义分析")
-            logs.append("")
-            logs.append("⚙️ 配置策略 2: User Preference Memory Strategy")
-            logs.append("   - 自动提取用户偏好")
-            logs.append("   - 支持跨会话记忆")
+            code_snippet = _build_memory_code_snippet("ltm", name, self.region_name, streaming=False)
+
+            if VERBOSE_LOGS:
+                logs.extend((
+                    "⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...",
+                    f"   - 名称: {name}",
+                    "   - 策略: 2 个 (语义记忆 + 用户偏好)",
+                    "   - 事件保留期: 30 天",
+                    "",
+                ))
+                logs.extend(_LTM_STRATEGY_LOG_LINES)
 
             # 创建带策略的 Memory
-            ltm = self.memory_client.create_memory_and_wait(
-                name=name,
-                strategies=[
-                    # 语义记忆策略: 提取重要的事实和信息
-                    {
-                        "semanticMemoryStrategy": {
-                            "name": "semantic_facts",
-                            "description": "提取用户提到的重要事实和信息",
-                            "namespaces": ["/strategies/{memoryStrategyId}/actors/{actorId}"]
-                        }
-                    },
-                    # 用户偏好策略: 提取用户的喜好和偏好
-                    {
-                        "userPreferenceMemoryStrategy": {
-                            "name": "user_preferences",
-                            "description": "提取用户的偏好、喜好和习惯",
-                            "namespaces": ["/strategies/{memoryStrategyId}/actors/{actorId}"]
-                        }
-                    }
-                ],
-                description="Long-term memory demo - 智能提取和跨会话记忆",
-                event_expiry_days=30  # 保存30天
-            )
-
-            logs.append("")
-            logs.append(f"✅ LTM 创建成功!")
-            logs.append(f"   - Memory ID: {ltm['id']}")
-            logs.append(f"   - 状态: {ltm.get('status', 'ACTIVE')}")
-            logs.append(f"   - 创建时间: {ltm.get('createdAt', 'N/A')}")
+            with _PerfSpan(timings, "create_memory_and_wait"):
+                ltm = self.memory_client.create_memory_and_wait(
+                    name=name,
+                    strategies=_LTM_STRATEGIES,
+                    description="Long-term memory demo - 智能提取和跨会话记忆",
+                    event_expiry_days=30  # 保存30天
+                )
+            self._invalidate_list_cache()
 
             # 提取策略信息
-            strategies = []
-            for strategy in ltm.get('strategies', []):
-                strategy_info = {
-                    "name": strategy.get('name', 'N/A'),
-                    "type": strategy.get('type', 'N/A'),
-                    "strategy_id": strategy.get('strategyId', 'N/A')
-                }
-                strategies.append(strategy_info)
-                logs.append(f"   - 策略: {strategy_info['name']} ({strategy_info['type']})")
-
-            logs.append("")
-            logs.append("💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成")
+            strategies = _strategy_summaries(ltm)
+
+            logs.extend(("", "✅ LTM 创建成功!"))
+            if VERBOSE_LOGS:
+                logs.extend((
+                    f"   - Memory ID: {ltm['id']}",
+                    f"   - 状态: {ltm.get('status', 'ACTIVE')}",
+                    f"   - 创建时间: {ltm.get('createdAt', 'N/A')}",
+                ))
+                logs.extend(f"   - 策略: {info['name']} ({info['type']})" for info in strategies)
+                logs.extend(("", "💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成"))
 
             return {
                 "success": True,
@@ -1724,7 +2252,8 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
                 "strategies": strategies,
                 "code": code_snippet,
                 "logs": logs,
-                "message": f"LTM 创建成功: {ltm['id']}"
+                "message": f"LTM 创建成功: {ltm['id']}",
+                **({"timings": timings} if timings is not None else {})
             }
 
         except Exception as e:
@@ -1733,43 +2262,103 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
                 "success": False,
                 "message": f"LTM 创建失败: {str(e)}",
                 "code": code_snippet,
-                "logs": logs
+                "logs": logs,
+                **_aws_error_fields(e),
+                **({"timings": timings} if timings is not None else {})
             }
 
-    def list_memories(self) -> Dict[str, Any]:
-        """列出所有 Memory 资源"""
-        try:
-            if not self.memory_client:
-                self.memory_client = MemoryClient(region_name=self.region_name)
+    def list_memories(self, page_size: int = 100, max_pages: int = 1, use_cache: bool = True) -> Dict[str, Any]:
+        """列出所有 Memory 资源 (每页 page_size 条，最多 max_pages 页)"""
+        return self._cached_list(
+            ("list_memories", page_size, max_pages), use_cache,
+            lambda: self._list_memories_uncached(page_size, max_pages)
+        )
 
-            memories = self.memory_client.list_memories(max_results=100)
+    def _list_memories_uncached(self, page_size: int, max_pages: int) -> Dict[str, Any]:
+        try:
+            control = self._ensure_memory_client().gmcp_client
 
+            # nextToken chains the pages, so they are fetched in order; the
+            # page count bounds the worst-case latency instead
             memory_list = []
-            for memory in memories:
-                memory_info = {
-                    "memory_id": memory.get('id', memory.get('memoryId', 'N/A')),
-                    "name": memory.get('name', 'N/A'),
-                    "status": memory.get('status', 'N/A'),
-                    "created_at": memory.get('createdAt', 'N/A'),
-                    "has_strategies": len(memory.get('strategies', [])) > 0,
-                    "strategy_count": len(memory.get('strategies', []))
-                }
-                memory_list.append(memory_info)
+            request = {"maxResults": min(page_size, 100)}
+            next_token = None
+            for _ in range(max_pages):
+                response = control.list_memories(**request)
+                for memory in response.get('memories', []):
+                    strategy_count = len(memory.get('strategies', []))
+                    memory_list.append({
+                        "memory_id": memory.get('id', memory.get('memoryId', 'N/A')),
+                        "name": memory.get('name', 'N/A'),
+                        "status": memory.get('status', 'N/A'),
+                        "created_at": memory.get('createdAt', 'N/A'),
+                        "has_strategies": strategy_count > 0,
+                        "strategy_count": strategy_count
+                    })
+                next_token = response.get('nextToken')
+                if not next_token:
+                    break
+                request["nextToken"] = next_token
 
             return {
                 "success": True,
                 "memories": memory_list,
                 "count": len(memory_list),
+                "truncated": bool(next_token),
                 "message": f"找到 {len(memory_list)} 个 Memory 资源"
             }
 
         except Exception as e:
             return {
                 "success": False,
-                "message": f"列出 Memory 失败: {str(e)}"
+                "message": f"列出 Memory 失败: {str(e)}",
+                **_aws_error_fields(e)
             }
 
-    def list_stm_events(self, actor_id: str, session_id: str = None, max_results: int = 10) -> Dict[str, Any]:
+    def iter_stm_events(self, actor_id: str, session_id: str = None, max_results: int = 10,
+                        include_full: bool = False) -> Generator[Dict[str, Any], None, None]:
+        """逐条产出 STM 事件（对话记录），每个会话的结果到达即产出"""
+        if not self.stm_manager:
+            raise RuntimeError("请先初始化 STM Manager")
+
+        if session_id:
+            # 获取特定会话的事件
+            events = self.stm_manager.list_events(
+                actor_id=actor_id,
+                session_id=session_id,
+                max_results=max_results
+            )
+            for event in events:
+                yield _stm_event_info(event, include_full)
+            return
+
+        # 获取用户的所有会话
+        sessions = self.stm_manager.list_actor_sessions(
+            actor_id=actor_id,
+            max_results=10
+        )
+        # 只获取前3个会话的事件 (并行请求，按会话顺序产出)
+        futures = [
+            self._submit(
+                self.stm_manager.list_events,
+                actor_id=actor_id,
+                session_id=session['sessionId'],
+                max_results=5
+            )
+            for session in sessions[:3]
+        ]
+        for session, future in zip(sessions, futures):
+            try:
+                events = future.result()
+            except Exception as e:
+                # One unreadable session should not hide the others
+                logger.warning(f"list_events failed for session {session['sessionId']}: {e}")
+                continue
+            for event in events:
+                yield _stm_event_info(event, include_full)
+
+    def list_stm_events(self, actor_id: str, session_id: str = None, max_results: int = 10,
+                        include_full: bool = False) -> Dict[str, Any]:
         """列出 STM 事件（对话记录）"""
         try:
             if not self.stm_manager:
@@ -1778,49 +2367,7 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
                     "message": "请先初始化 STM Manager"
                 }
 
-            if session_id:
-                # 获取特定会话的事件
-                events = self.stm_manager.list_events(
-                    actor_id=actor_id,
-                    session_id=session_id,
-                    max_results=max_results
-                )
-            else:
-                # 获取用户的所有会话
-                sessions = self.stm_manager.list_actor_sessions(
-                    actor_id=actor_id,
-                    max_results=10
-                )
-                events = []
-                for session in sessions[:3]:  # 只获取前3个会话的事件
-                    session_events = self.stm_manager.list_events(
-                        actor_id=actor_id,
-                        session_id=session['sessionId'],
-                        max_results=5
-                    )
-                    events.extend(session_events)
-
-            event_list = []
-            for event in events:
-                event_info = {
-                    "event_id": event.get('eventId', 'N/A'),
-                    "session_id": event.get('sessionId', 'N/A'),
-                    "timestamp": event.get('eventTimestamp', 'N/A'),
-                    "payload_count": len(event.get('payload', []))
-                }
-
-                # 提取对话内容
-                messages = []
-                for item in event.get('payload', []):
-                    if 'conversational' in item:
-                        conv = item['conversational']
-                        messages.append({
-                            "role": conv.get('role', 'N/A'),
-                            "text": conv.get('content', {}).get('text', 'N/A')[:100]  # 只显示前100字符
-                        })
-
-                event_info["messages"] = messages
-                event_list.append(event_info)
+            event_list = list(self.iter_stm_events(actor_id, session_id, max_results, include_full))
 
             return {
                 "success": True,
@@ -1832,11 +2379,19 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
         except Exception as e:
             return {
                 "success": False,
-                "message": f"列出 STM 事件失败: {str(e)}"
+                "message": f"列出 STM 事件失败: {str(e)}",
+                **_aws_error_fields(e)
             }
 
-    def list_ltm_records(self, actor_id: str = None, max_results: int = 10) -> Dict[str, Any]:
+    def list_ltm_records(self, actor_id: str = None, max_results: int = 10, use_cache: bool = True,
+                         include_full: bool = False) -> Dict[str, Any]:
         """列出 LTM 记录（提取的记忆）"""
+        return self._cached_list(
+            ("list_ltm_records", self.ltm_memory_id, actor_id, max_results, include_full), use_cache,
+            lambda: self._list_ltm_records_uncached(actor_id, max_results, include_full)
+        )
+
+    def _list_ltm_records_uncached(self, actor_id: str, max_results: int, include_full: bool) -> Dict[str, Any]:
         try:
             if not self.ltm_manager:
                 return {
@@ -1856,25 +2411,7 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
                 max_results=max_results
             )
 
-            record_list = []
-            for record in records:
-                record_info = {
-                    "record_id": record.get('memoryRecordId', 'N/A'),
-                    "namespace": record.get('namespace', 'N/A'),
-                    "created_at": record.get('createdAt', 'N/A'),
-                }
-
-                # 提取内容
-                content = record.get('content', {})
-                if isinstance(content, dict):
-                    text = content.get('text', 'N/A')
-                else:
-                    text = str(content)
-
-                record_info["content"] = text[:200]  # 只显示前200字符
-                record_info["content_full"] = text  # 完整内容
-
-                record_list.append(record_info)
+            record_list = [_record_info(record, include_full) for record in records]
 
             return {
                 "success": True,
@@ -1886,16 +2423,51 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
         except Exception as e:
             return {
                 "success": False,
-                "message": f"列出 LTM 记录失败: {str(e)}"
+                "message": f"列出 LTM 记录失败: {str(e)}",
+                **_aws_error_fields(e)
             }
 
+    def list_ltm_records_multi(self, actor_ids: List[str], max_results: int = 10,
+                               include_full: bool = False) -> Dict[str, Any]:
+        """列出多个用户的 LTM 记录 (并行请求)"""
+        if not self.ltm_manager:
+            return {
+                "success": False,
+                "message": "请先初始化 LTM Manager"
+            }
+
+        futures = {
+            actor_id: self._submit(
+                self.ltm_manager.list_long_term_memory_records,
+                namespace_prefix=f"/strategies/{{memoryStrategyId}}/actors/{actor_id}",
+                max_results=max_results
+            )
+            for actor_id in dict.fromkeys(actor_ids)
+        }
+
+        # One actor failing does not hide the others' records
+        records_by_actor = {}
+        errors = {}
+        for actor_id, future in futures.items():
+            try:
+                records_by_actor[actor_id] = [_record_info(record, include_full) for record in future.result()]
+            except Exception as e:
+                errors[actor_id] = {"message": str(e), **_aws_error_fields(e)}
+
+        count = sum(len(records) for records in records_by_actor.values())
+        return {
+            "success": len(errors) < len(futures) or not futures,
+            "records_by_actor": records_by_actor,
+            "errors": errors,
+            "count": count,
+            "message": f"找到 {count} 条 LTM 记录 ({len(records_by_actor)}/{len(futures)} 个用户)"
+        }
+
     def delete_memory(self, memory_id: str) -> Dict[str, Any]:
         """删除 Memory 资源"""
         try:
-            if not self.memory_client:
-                self.memory_client = MemoryClient(region_name=self.region_name)
-
-            self.memory_client.delete_memory(memory_id)
+            self._ensure_memory_client().delete_memory(memory_id)
+            self._invalidate_list_cache()
 
             return {
                 "success": True,
@@ -1905,9 +2477,181 @@ print(f"LTM 创建成功: {{ltm['id']}}")'''
         except Exception as e:
             return {
                 "success": False,
-                "message": f"删除 Memory 失败: {str(e)}"
+                "message": f"删除 Memory 失败: {str(e)}",
+                **_aws_error_fields(e)
             }
 
+    # Async variants for event-loop callers: the blocking Memory calls run in
+    # the default executor (not self._io_pool, which list_stm_events itself
+    # fans out on) so handlers overlap AWS I/O instead of stalling the loop
+
+    async def ainitialize(self, stm_memory_id: str = None, ltm_memory_id: str = None) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.initialize, stm_memory_id, ltm_memory_id)
+
+    # The demo steps block for a full LLM completion as well as the memory calls
+    async def ademo_stm_step1(self, user_message: str, actor_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.demo_stm_step1, user_message, actor_id)
+
+    async def ademo_stm_step2(self, user_message: str, session_id: str, actor_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.demo_stm_step2, user_message, session_id, actor_id)
+
+    async def ademo_ltm_step1(self, user_preference: str, actor_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.demo_ltm_step1, user_preference, actor_id)
+
+    async def ademo_ltm_step2(self, user_question: str, actor_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.demo_ltm_step2, user_question, actor_id)
+
+    async def ademo_combined(self, user_question: str, actor_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.demo_combined, user_question, actor_id)
+
+    async def acreate_stm_memory(self, name: str = None, profile: Optional[bool] = None) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.create_stm_memory, name, profile)
+
+    async def acreate_ltm_memory(self, name: str = None, profile: Optional[bool] = None) -> Dict[str, Any]:
+        logs = []
+        async with aclosing(self.acreate_ltm_memory_progress(name, profile)) as progress:
+            async for event_type, data in progress:
+                if event_type == "log":
+                    logs.append(data)
+                else:
+                    return {**data, "logs": logs}
+
+    async def acreate_ltm_memory_progress(self, name: str = None,
+                                          profile: Optional[bool] = None) -> AsyncGenerator[tuple, None]:
+        """创建 Long-Term Memory，轮询状态时不占用线程
+
+        Yields ("log", line) progress while the memory becomes ACTIVE, then
+        one ("result", dict) shaped like create_ltm_memory()'s return value.
+        The log lines are create_ltm_memory()'s, plus (with VERBOSE_LOGS) one
+        per status poll.
+        """
+        code_snippet = ""
+        timings = {} if (PROFILE_AWS_CALLS if profile is None else profile) else None
+        try:
+            yield "log", "🚀 开始创建 Long-Term Memory (LTM)"
+
+            if not self.memory_client:
+                yield "log", "📡 初始化 MemoryClient..."
+                with _PerfSpan(timings, "memory_client_init"):
+                    await asyncio.to_thread(self._ensure_memory_client)
+                yield "log", f"✅ MemoryClient 初始化成功 (region: {self.region_name})"
+            client = self.memory_client
+
+            if not name:
+                name = f"AgentCore_LTM_Demo_{uuid.uuid4().hex[:8]}"
+                yield "log", f"📝 生成 Memory 名称: {name}"
+
+            code_snippet = _build_memory_code_snippet("ltm", name, self.region_name, streaming=False)
+
+            if VERBOSE_LOGS:
+                for line in (
+                    "⏳ 调用 AWS Bedrock AgentCore API 创建 Memory...",
+                    f"   - 名称: {name}",
+                    "   - 策略: 2 个 (语义记忆 + 用户偏好)",
+                    "   - 事件保留期: 30 天",
+                    "",
+                    *_LTM_STRATEGY_LOG_LINES,
+                ):
+                    yield "log", line
+
+            # Same ACTIVE/FAILED handling as create_memory_and_wait, with the
+            # waits on the event loop instead of a blocked thread
+            with _PerfSpan(timings, "create_memory_and_wait") as span:
+                memory = await asyncio.to_thread(
+                    client.create_memory,
+                    name=name,
+                    strategies=_LTM_STRATEGIES,
+                    description="Long-term memory demo - 智能提取和跨会话记忆",
+                    event_expiry_days=30
+                )
+                memory_id = memory.get('memoryId', memory.get('id'))
+
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + MEMORY_WAIT_SECONDS
+                delay = MEMORY_POLL_INITIAL_SECONDS
+                while True:
+                    response = await asyncio.to_thread(client.gmcp_client.get_memory, memoryId=memory_id)
+                    ltm = response['memory']
+                    status = ltm.get('status')
+                    if status == "ACTIVE":
+                        break
+                    if status == "FAILED":
+                        raise RuntimeError(f"Memory creation failed: {ltm.get('failureReason', 'Unknown')}")
+                    if loop.time() >= deadline:
+                        raise TimeoutError(f"Memory {memory_id} did not become ACTIVE within {MEMORY_WAIT_SECONDS} seconds")
+                    if VERBOSE_LOGS:
+                        with span.paused():  # count AWS time, not the consumer's
+                            yield "log", f"⏳ 当前状态: {status}，等待中..."
+                    await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+                    delay = min(delay * 2, MEMORY_POLL_MAX_SECONDS)
+
+            self._invalidate_list_cache()
+            strategies = _strategy_summaries(ltm)
+
+            yield "log", ""
+            yield "log", "✅ LTM 创建成功!"
+            if VERBOSE_LOGS:
+                for line in (
+                    f"   - Memory ID: {memory_id}",
+                    f"   - 状态: {ltm.get('status', 'ACTIVE')}",
+                    f"   - 创建时间: {ltm.get('createdAt', 'N/A')}",
+                    *(f"   - 策略: {info['name']} ({info['type']})" for info in strategies),
+                    "",
+                    "💡 提示: LTM 会异步提取记忆，通常需要 10-15 秒完成",
+                ):
+                    yield "log", line
+
+            yield "result", {
+                "success": True,
+                "memory_id": memory_id,
+                "name": ltm.get('name', name),
+                "strategies": strategies,
+                "code": code_snippet,
+                "message": f"LTM 创建成功: {memory_id}",
+                **({"timings": timings} if timings is not None else {})
+            }
+
+        except Exception as e:
+            yield "log", f"❌ LTM 创建失败: {str(e)}"
+            yield "result", {
+                "success": False,
+                "message": f"LTM 创建失败: {str(e)}",
+                "code": code_snippet,
+                **_aws_error_fields(e),
+                **({"timings": timings} if timings is not None else {})
+            }
+
+    async def alist_memories(self, page_size: int = 100, max_pages: int = 1) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.list_memories, page_size, max_pages)
+
+    async def alist_stm_events(self, actor_id: str, session_id: str = None, max_results: int = 10,
+                               include_full: bool = False) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.list_stm_events, actor_id, session_id, max_results, include_full)
+
+    async def alist_ltm_records(self, actor_id: str = None, max_results: int = 10,
+                                include_full: bool = False) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.list_ltm_records, actor_id, max_results, include_full=include_full)
+
+    async def adelete_memory(self, memory_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.delete_memory, memory_id)
+
+
+def _prewarm_clients(region_name: str):
+    """Populate the client cache so the first initialize() finds warm clients"""
+    try:
+        _get_bedrock_runtime(region_name)
+        memory_client = _get_memory_client(region_name)
+        if PREWARM_CONNECTIONS:
+            memory_client.gmcp_client.list_memories(maxResults=1)
+    except Exception as e:
+        logger.warning(f"Client pre-warm failed, clients will be built on first use: {e}")
+
 
-# Global instance
-memory_api = AgentCoreMemoryAPI()
+@lru_cache(maxsize=8)
+def get_memory_api(region_name: str = "us-west-2") -> AgentCoreMemoryAPI:
+    """Shared AgentCoreMemoryAPI for a region, created on first use"""
+    api = AgentCoreMemoryAPI(region_name=region_name)
+    # Resolve credentials and load service models in the background, off the
+    # request path
+    threading.Thread(target=_prewarm_clients, args=(region_name,), daemon=True).start()
+    return api
@@ -18,9 +18,16 @@ from fastapi.middleware.wsgi import WSGIMiddleware
 from pydantic import BaseModel
 import time
 import httpx
+from contextlib import asynccontextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables BEFORE importing modules that depend on them
 load_dotenv()
+os.environ["AGENTCORE_DOTENV_LOADED"] = "1"
 
 # Import computer use functions
 # COMMENTED OUT: sandbox_computer_use.py module is missing
@@ -38,11 +45,14 @@ from agentcore_browser_tool import (
 # Import AgentCore code interpreter functions
 from agentcore_code_interpreter import (
     execute_agentcore_code, reset_agentcore_sessions, get_active_sessions,
-    execute_file_management_demo, execute_shell_command_demo, init_agentcore_code_interpreter_vars
+    execute_file_management_demo, execute_shell_command_demo, init_agentcore_code_interpreter_vars,
+    start_warm_pool, stop_warm_pool
 )
 
 # Import AgentCore memory API
-from agentcore_memory_api import memory_api
+from agentcore_memory_api import get_memory_api
+
+memory_api = get_memory_api()
 
 # Configure logging
 class WebSocketLogHandler(logging.Handler):
@@ -98,7 +108,14 @@ logging.basicConfig(level=logging.INFO,
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AgentCore on AWS Demo UI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_warm_pool()
+    yield
+    await stop_warm_pool()
+    await asyncio.to_thread(memory_api.close)
+
+app = FastAPI(title="AgentCore on AWS Demo UI", lifespan=lifespan)
 
 # Mount static files directory
 os.makedirs("static", exist_ok=True)
@@ -586,7 +603,8 @@ async def execute_agentcore_code_endpoint(code_request: CodeRequest):
         return JSONResponse({
             "success": True,
             "output": result["output"],
-            "session_id": result["session_id"]
+            "session_id": result["session_id"],
+            **({"evaluated_locally": True} if result.get("evaluated_locally") else {})
         })
     else:
         return JSONResponse({
@@ -645,6 +663,25 @@ async def execute_shell_command_demo_endpoint():
         }, status_code=500)
 
 # AgentCore Memory API endpoints
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+def _ndjson_line(obj) -> bytes:
+    """One NDJSON line, serialized with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    # default=str covers the SDK's datetime timestamps, which orjson encodes natively
+    return (json.dumps(obj, ensure_ascii=False, default=str) + "\n").encode()
+
+def _sse_response(events) -> StreamingResponse:
+    """SSE response for a memory_api *_stream generator"""
+    # The generators block on AWS/Bedrock calls; passed as plain iterators,
+    # Starlette steps them in its threadpool instead of on the event loop
+    return StreamingResponse(events, media_type="text/event-stream", headers=_SSE_HEADERS)
+
 class MemoryInitRequest(BaseModel):
     stm_memory_id: str
     ltm_memory_id: str
@@ -673,159 +710,84 @@ class MemoryCombinedRequest(BaseModel):
 @app.post("/api/memory/initialize")
 async def initialize_memory(request: MemoryInitRequest):
     """Initialize Memory Managers"""
-    result = memory_api.initialize(request.stm_memory_id, request.ltm_memory_id)
+    result = await memory_api.ainitialize(request.stm_memory_id, request.ltm_memory_id)
     return JSONResponse(result)
 
 @app.get("/api/memory/initialize-stream")
 async def initialize_memory_stream(stm_memory_id: str, ltm_memory_id: str):
     """Initialize Memory Managers (streaming)"""
-    async def event_generator():
-        for event in memory_api.initialize_stream(stm_memory_id, ltm_memory_id):
-            yield event
-            await asyncio.sleep(0.05)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.initialize_stream(stm_memory_id, ltm_memory_id))
 
 @app.post("/api/memory/stm/step1")
 async def memory_stm_step1(request: MemorySTMStep1Request):
     """STM Demo - Step 1: Store first message"""
-    result = memory_api.demo_stm_step1(request.user_message, request.actor_id)
+    result = await memory_api.ademo_stm_step1(request.user_message, request.actor_id)
     return JSONResponse(result)
 
 @app.get("/api/memory/stm/step1-stream")
 async def memory_stm_step1_stream(user_message: str, actor_id: str):
     """STM Demo - Step 1: Store first message (streaming)"""
-    async def event_generator():
-        for event in memory_api.demo_stm_step1_stream(user_message, actor_id):
-            yield event
-            await asyncio.sleep(0.05)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.demo_stm_step1_stream(user_message, actor_id))
 
 @app.post("/api/memory/stm/step2")
 async def memory_stm_step2(request: MemorySTMStep2Request):
     """STM Demo - Step 2: Query with history"""
-    result = memory_api.demo_stm_step2(request.user_message, request.session_id, request.actor_id)
+    result = await memory_api.ademo_stm_step2(request.user_message, request.session_id, request.actor_id)
     return JSONResponse(result)
 
 @app.get("/api/memory/stm/step2-stream")
 async def memory_stm_step2_stream(user_message: str, session_id: str, actor_id: str):
     """STM Demo - Step 2: Query with history (streaming)"""
-    async def event_generator():
-        for event in memory_api.demo_stm_step2_stream(user_message, session_id, actor_id):
-            yield event
-            await asyncio.sleep(0.05)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.demo_stm_step2_stream(user_message, session_id, actor_id))
 
 @app.post("/api/memory/ltm/step1")
 async def memory_ltm_step1(request: MemoryLTMStep1Request):
     """LTM Demo - Step 1: Express preferences"""
-    result = memory_api.demo_ltm_step1(request.user_preference, request.actor_id)
+    result = await memory_api.ademo_ltm_step1(request.user_preference, request.actor_id)
     return JSONResponse(result)
 
 @app.post("/api/memory/ltm/step2")
 async def memory_ltm_step2(request: MemoryLTMStep2Request):
     """LTM Demo - Step 2: Retrieve from new session"""
-    result = memory_api.demo_ltm_step2(request.user_question, request.actor_id)
+    result = await memory_api.ademo_ltm_step2(request.user_question, request.actor_id)
     return JSONResponse(result)
 
 @app.get("/api/memory/ltm/step1-stream")
 async def memory_ltm_step1_stream(user_preference: str, actor_id: str):
     """LTM Demo - Step 1: Express preferences (streaming)"""
-    async def event_generator():
-        for event in memory_api.demo_ltm_step1_stream(user_preference, actor_id):
-            yield event
-            await asyncio.sleep(0.05)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.demo_ltm_step1_stream(user_preference, actor_id))
 
 @app.get("/api/memory/ltm/step2-stream")
 async def memory_ltm_step2_stream(user_question: str, actor_id: str):
     """LTM Demo - Step 2: Retrieve from new session (streaming)"""
-    async def event_generator():
-        for event in memory_api.demo_ltm_step2_stream(user_question, actor_id):
-            yield event
-            await asyncio.sleep(0.05)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.demo_ltm_step2_stream(user_question, actor_id))
 
 @app.post("/api/memory/combined")
 async def memory_combined(request: MemoryCombinedRequest):
     """Combined Demo: STM + LTM"""
-    result = memory_api.demo_combined(request.user_question, request.actor_id)
+    result = await memory_api.ademo_combined(request.user_question, request.actor_id)
     return JSONResponse(result)
 
 @app.get("/api/memory/combined-stream")
 async def memory_combined_stream(user_question: str, actor_id: str):
     """Combined Demo: STM + LTM (streaming)"""
-    async def event_generator():
-        for event in memory_api.demo_combined_stream(user_question, actor_id):
-            yield event
-            await asyncio.sleep(0.05)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.demo_combined_stream(user_question, actor_id))
 
 # Memory Management API endpoints
 class CreateMemoryRequest(BaseModel):
     name: Optional[str] = None
+    profile: Optional[bool] = None
 
 class ListEventsRequest(BaseModel):
     actor_id: str
     session_id: Optional[str] = None
     max_results: Optional[int] = 10
+    include_full: bool = False
 
 class ListRecordsRequest(BaseModel):
     actor_id: Optional[str] = None
     max_results: Optional[int] = 10
+    include_full: bool = False
 
 class DeleteMemoryRequest(BaseModel):
     memory_id: str
@@ -833,75 +795,70 @@ class DeleteMemoryRequest(BaseModel):
 @app.post("/api/memory/create-stm")
 async def create_stm_memory(request: CreateMemoryRequest):
     """Create STM Memory"""
-    result = memory_api.create_stm_memory(request.name)
+    result = await memory_api.acreate_stm_memory(request.name, request.profile)
     return JSONResponse(result)
 
 @app.get("/api/memory/create-stm-stream")
 async def create_stm_memory_stream(name: str = None):
     """Create STM Memory with streaming response"""
-    async def event_generator():
-        for event in memory_api.create_stm_memory_stream(name):
-            yield event
-            # Small delay to ensure proper streaming
-            await asyncio.sleep(0.1)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.create_stm_memory_stream(name))
 
 @app.post("/api/memory/create-ltm")
 async def create_ltm_memory(request: CreateMemoryRequest):
     """Create LTM Memory"""
-    result = memory_api.create_ltm_memory(request.name)
+    result = await memory_api.acreate_ltm_memory(request.name, request.profile)
     return JSONResponse(result)
 
 @app.get("/api/memory/create-ltm-stream")
 async def create_ltm_memory_stream(name: str = None):
     """Create LTM Memory with streaming response"""
-    async def event_generator():
-        for event in memory_api.create_ltm_memory_stream(name):
-            yield event
-            # Small delay to ensure proper streaming
-            await asyncio.sleep(0.1)
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return _sse_response(memory_api.create_ltm_memory_stream(name))
 
 @app.get("/api/memory/list")
-async def list_memories():
+async def list_memories(page_size: int = 100, max_pages: int = 1):
     """List all Memory resources"""
-    result = memory_api.list_memories()
+    result = await memory_api.alist_memories(page_size, max_pages)
     return JSONResponse(result)
 
 @app.post("/api/memory/list-stm-events")
 async def list_stm_events(request: ListEventsRequest):
     """List STM events"""
-    result = memory_api.list_stm_events(request.actor_id, request.session_id, request.max_results)
+    result = await memory_api.alist_stm_events(
+        request.actor_id, request.session_id, request.max_results, request.include_full
+    )
     return JSONResponse(result)
 
+@app.post("/api/memory/stm-events-stream")
+async def stream_stm_events(request: ListEventsRequest):
+    """Stream STM events as NDJSON, one event per line as it is parsed"""
+    def ndjson_lines():
+        events = memory_api.iter_stm_events(
+            request.actor_id, request.session_id, request.max_results, request.include_full
+        )
+        while True:
+            # Only listing errors are reported as such; a serialization error
+            # below is a bug here, not a failed AWS call
+            try:
+                event = next(events)
+            except StopIteration:
+                return
+            except Exception as e:
+                yield _ndjson_line({"error": f"列出 STM 事件失败: {str(e)}"})
+                return
+            yield _ndjson_line(event)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @app.post("/api/memory/list-ltm-records")
 async def list_ltm_records(request: ListRecordsRequest):
     """List LTM records"""
-    result = memory_api.list_ltm_records(request.actor_id, request.max_results)
+    result = await memory_api.alist_ltm_records(request.actor_id, request.max_results, request.include_full)
     return JSONResponse(result)
 
 @app.post("/api/memory/delete")
 async def delete_memory(request: DeleteMemoryRequest):
     """Delete Memory resource"""
-    result = memory_api.delete_memory(request.memory_id)
+    result = await memory_api.adelete_memory(request.memory_id)
     return JSONResponse(result)
 
 # Initialize shared variables